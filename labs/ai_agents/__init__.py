@@ -2,6 +2,65 @@
 AI Agents Module
 
 This module provides a framework for creating and managing AI agents with different capabilities.
+
+Public names are imported lazily on first access, so importing the package
+loads nothing beyond this file.
 """
+# Kept free of typing and other imports so importing the package stays cheap
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'BaseAgent': 'base_agent',
+    'AgentState': 'base_agent',
+    'Tool': 'base_agent',
+    'ToolCall': 'base_agent',
+    'ToolResult': 'base_agent',
+    'ToolError': 'base_agent',
+    'ToolManifest': 'base_agent',
+    'Message': 'messages',
+    'MessageRole': 'messages',
+    'ConversationalAgent': 'conversational_agent',
+    'CalculatorTool': 'conversational_agent',
+    'WebSearchTool': 'conversational_agent',
+    'AgentManager': 'agent_manager',
+    'SessionStore': 'agent_manager',
+    'InMemorySessionStore': 'agent_manager',
+    'SessionLog': 'session_log',
+    'SessionLogStore': 'session_log',
+    'LLMBackend': 'backends',
+    'EchoBackend': 'backends',
+    'HTTPBackend': 'backends',
+    'BackendError': 'backends',
+    'BatchingBackend': 'batching',
+    'ConversationWindow': 'memory',
+    'VectorMemory': 'vector_memory',
+    'HashingEmbedder': 'vector_memory',
+    'MetricsRegistry': 'metrics',
+    'CancellationToken': 'cancellation',
+    'OperationCancelled': 'cancellation',
+    'AdmissionController': 'admission',
+    'Overloaded': 'admission',
+    'ToolResultCache': 'tool_cache',
+    'ToolExecutor': 'tool_executor',
+    'ToolPlan': 'tool_plan',
+    'WorkerPools': 'worker_pools',
+    'SingleFlight': 'single_flight',
+    'PrefixRegistry': 'prefix_registry',
+    'fan_out': 'fanout',
+    'FanOutResult': 'fanout',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Cache it so later lookups skip this function
+    globals()[name] = value
+    return value
 
-__all__ = ['BaseAgent', 'ToolUsingAgent', 'ConversationalAgent', 'AgentManager']
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
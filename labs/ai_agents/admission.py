@@ -0,0 +1,125 @@
+"""
+Admission Control Implementation
+
+This module provides token-bucket rate limiting and an admission controller
+that bounds how much work is outstanding, so that under a traffic spike new
+requests are turned away early with a hint of when to retry instead of
+queueing without limit.
+"""
+import time
+from collections import OrderedDict, Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+class Overloaded(Exception):
+    """Raised when a request is rejected so the caller can back off and retry."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """A token bucket refilled at ``rate`` tokens per second up to ``capacity``."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens if available.
+
+        Returns:
+            0 if the tokens were taken, otherwise the seconds until they will be
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (amount - self.tokens) / self.rate
+
+class AdmissionController:
+    """Admits requests under a global outstanding limit and per-user rate limits.
+
+    A request is admitted with ``admit`` and must be released with ``release``
+    once it has been answered, or wrapped in ``admitted``. Rejections raise
+    Overloaded with a ``retry_after`` hint in seconds.
+    """
+
+    def __init__(
+        self,
+        max_outstanding: Optional[int] = None,
+        user_rate: Optional[float] = None,
+        user_burst: Optional[float] = None,
+        max_users: int = 10000,
+        overload_retry_after: float = 1.0
+    ):
+        """Initialize the controller.
+
+        Args:
+            max_outstanding: Maximum number of admitted requests not yet released
+                (None for no limit)
+            user_rate: Requests per second allowed for each user (None for no limit)
+            user_burst: Requests a user may make at once (``user_rate`` rounded up by default)
+            max_users: Number of per-user buckets kept, least recently used dropped first
+            overload_retry_after: Retry hint given when the global limit is reached
+        """
+        self.max_outstanding = max_outstanding
+        self.user_rate = user_rate
+        self.user_burst = user_burst if user_burst is not None else max(1.0, float(user_rate or 1))
+        self.max_users = max_users
+        self.overload_retry_after = overload_retry_after
+        self.outstanding = 0
+        self.admitted_total = 0
+        self.rejected: Counter = Counter()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    def admit(self, user_id: str) -> None:
+        """Admit a request from a user.
+
+        Raises:
+            Overloaded: If too many requests are outstanding or the user is over their rate
+        """
+        if self.max_outstanding is not None and self.outstanding >= self.max_outstanding:
+            self.rejected["overloaded"] += 1
+            raise Overloaded(
+                f"Too many requests in progress ({self.outstanding})",
+                retry_after=self.overload_retry_after
+            )
+        if self.user_rate is not None:
+            wait = self._bucket(user_id).try_acquire()
+            if wait:
+                self.rejected["rate_limited"] += 1
+                raise Overloaded(f"Rate limit exceeded for user {user_id}", retry_after=wait)
+        self.outstanding += 1
+        self.admitted_total += 1
+
+    def release(self) -> None:
+        """Mark an admitted request as answered."""
+        self.outstanding = max(0, self.outstanding - 1)
+
+    @contextmanager
+    def admitted(self, user_id: str) -> Iterator[None]:
+        """Admit a request for the duration of a ``with`` block."""
+        self.admit(user_id)
+        try:
+            yield
+        finally:
+            self.release()
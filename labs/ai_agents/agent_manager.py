@@ -0,0 +1,404 @@
+"""
+Agent Manager Implementation
+
+This module provides a runtime that hosts many agent sessions in one process.
+Sessions are created lazily, idle sessions are evicted to a pluggable store,
+and messages are scheduled so that each session is processed in order while
+different sessions run in parallel.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+from .base_agent import BaseAgent, Message, MessageRole
+from .cancellation import CancellationToken, OperationCancelled
+from .admission import AdmissionController, Overloaded
+
+logger = logging.getLogger(__name__)
+
+class SessionStore(ABC):
+    """Storage backend for the state of evicted sessions.
+
+    Stores that set ``incremental`` write only what changed since the last
+    save, so the manager also saves to them after every turn, which keeps
+    messages that later leave the window from being lost.
+    """
+
+    incremental: bool = False
+
+    @abstractmethod
+    async def save(self, session_id: str, history: List[Dict[str, Any]]) -> None:
+        """Persist the conversation history of a session."""
+        pass
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Load the conversation history of a session, or None if unknown."""
+        pass
+
+    async def delete(self, session_id: str) -> None:
+        """Remove a session from the store."""
+        pass
+
+    async def save_messages(
+        self,
+        session_id: str,
+        messages: List[Message],
+        appended: Optional[int] = None
+    ) -> None:
+        """Persist a session's messages.
+
+        Args:
+            session_id: Session to save
+            messages: The session's conversation window
+            appended: Number of unpinned messages added to the window since it
+                was filled from the store (``ConversationWindow.appended``),
+                including those it no longer holds
+
+        Stores that can write messages directly override this to skip the
+        round trip through dictionaries.
+        """
+        await self.save(session_id, [message.to_dict() for message in messages])
+
+    async def load_messages(self, session_id: str, limit: Optional[int] = None) -> Optional[List[Message]]:
+        """Load a session's messages, or None if unknown.
+
+        Args:
+            session_id: Session to load
+            limit: Hint that only the system messages and the last ``limit``
+                others are needed; stores may return more
+        """
+        history = await self.load(session_id)
+        return None if history is None else [Message.from_dict(data) for data in history]
+
+class InMemorySessionStore(SessionStore):
+    """Session store that keeps evicted histories in a dictionary."""
+
+    def __init__(self):
+        self._data: Dict[str, List[Dict[str, Any]]] = {}
+
+    async def save(self, session_id: str, history: List[Dict[str, Any]]) -> None:
+        self._data[session_id] = history
+
+    async def load(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        return self._data.get(session_id)
+
+    async def delete(self, session_id: str) -> None:
+        self._data.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class _Session:
+    """Runtime state of a single hosted session."""
+
+    __slots__ = ('session_id', 'agent', 'loading', 'inbox', 'worker', 'last_active')
+
+    def __init__(self, session_id: str, max_inbox: Optional[int] = None):
+        self.session_id = session_id
+        self.agent: Optional[BaseAgent] = None
+        self.loading: Optional[asyncio.Task] = None
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=max_inbox or 0)
+        self.worker: Optional[asyncio.Task] = None
+        self.last_active = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        """Whether the session has no queued or running work."""
+        return (self.worker is None or self.worker.done()) and self.inbox.empty()
+
+class AgentManager:
+    """Hosts many agent sessions and schedules their messages.
+
+    Messages for the same session are processed strictly in arrival order by a
+    per-session worker. Workers of different sessions run in parallel; when
+    ``max_concurrency`` is set they share a FIFO semaphore and each worker
+    holds at most one turn, so busy sessions take turns with quiet ones instead
+    of starving them.
+
+    Backpressure is explicit: a message is rejected with Overloaded when its
+    session already has ``max_inbox`` messages waiting or when ``admission``
+    refuses it, rather than being queued without limit.
+    """
+
+    def __init__(
+        self,
+        agent_factory: Callable[[str], BaseAgent],
+        store: Optional[SessionStore] = None,
+        max_sessions: Optional[int] = 1000,
+        idle_timeout: Optional[float] = 300.0,
+        max_concurrency: Optional[int] = None,
+        sweep_interval: float = 30.0,
+        max_inbox: Optional[int] = None,
+        admission: Optional[AdmissionController] = None
+    ):
+        """Initialize the manager.
+
+        Args:
+            agent_factory: Callable creating a fresh agent for a session ID
+            store: Where evicted sessions are saved (in-memory by default)
+            max_sessions: Maximum number of sessions kept in memory (None for no limit);
+                busy sessions are never evicted, so this is a soft limit
+            idle_timeout: Seconds without activity after which a session is evicted
+            max_concurrency: Maximum number of turns processed at once across sessions
+            sweep_interval: Seconds between idle-session sweeps once started
+            max_inbox: Maximum number of messages waiting per session (None for no limit)
+            admission: Controller applying global and per-user limits to incoming messages
+        """
+        self.agent_factory = agent_factory
+        self.store = store if store is not None else InMemorySessionStore()
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_concurrency = max_concurrency
+        self.sweep_interval = sweep_interval
+        self.max_inbox = max_inbox
+        self.admission = admission
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._evictions: Dict[str, asyncio.Task] = {}
+        self._scheduler = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def active_sessions(self) -> List[str]:
+        """IDs of the sessions currently held in memory."""
+        return list(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    async def process_message(
+        self,
+        session_id: str,
+        message: Message,
+        *,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        user_id: Optional[str] = None
+    ) -> Message:
+        """Process a message in the given session, creating the session if needed.
+        
+        ``timeout`` starts counting when the message is queued, so time spent
+        waiting behind the session's earlier messages counts against it: a
+        message whose token fires while queued is answered at once and
+        dropped without being added to the session's memory.
+        Admission rate limits apply to ``user_id``, which defaults to the
+        session ID.
+        
+        Raises:
+            Overloaded: If the message was rejected; retry after ``retry_after`` seconds
+        """
+        if self.admission is not None:
+            self.admission.admit(user_id if user_id is not None else session_id)
+        token = CancellationToken(timeout, parent=cancel_token) if timeout is not None else cancel_token
+        try:
+            session = self._open_session(session_id)
+            future = asyncio.get_running_loop().create_future()
+            try:
+                session.inbox.put_nowait((message, token, future))
+            except asyncio.QueueFull:
+                raise Overloaded(f"Too many messages waiting in session {session_id}") from None
+            if session.worker is None or session.worker.done():
+                session.worker = asyncio.create_task(self._run_session(session))
+            if token is None:
+                return await future
+            try:
+                return await token.run(future)
+            except OperationCancelled as e:
+                logger.warning(f"Stopped waiting for session {session_id}: {e.reason}")
+                return Message(
+                    role=MessageRole.ASSISTANT,
+                    content=f"I stopped before finishing: {e.reason}"
+                )
+        finally:
+            if token is not cancel_token:
+                token.close()
+            if self.admission is not None:
+                self.admission.release()
+
+    async def get_agent(self, session_id: str) -> BaseAgent:
+        """Get the agent of a session, creating or restoring it if needed."""
+        return await self._ensure_agent(self._open_session(session_id))
+
+    def _open_session(self, session_id: str) -> _Session:
+        """Get an in-memory session, registering a new one if needed."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            session.last_active = time.monotonic()
+            return session
+
+        session = self._sessions[session_id] = _Session(session_id, self.max_inbox)
+        self._enforce_capacity()
+        return session
+
+    def _enforce_capacity(self) -> None:
+        """Schedule eviction of least recently used idle sessions over capacity."""
+        if self.max_sessions is None:
+            return
+        excess = len(self._sessions) - self.max_sessions
+        for session_id, session in list(self._sessions.items()):
+            if excess <= 0:
+                break
+            if session.idle and session.agent is not None:
+                self._schedule_eviction(session_id)
+                excess -= 1
+
+    async def _ensure_agent(self, session: _Session) -> BaseAgent:
+        """Get a session's agent, loading it exactly once."""
+        if session.agent is None:
+            if session.loading is None:
+                session.loading = asyncio.create_task(self._load_agent(session.session_id))
+            try:
+                session.agent = await asyncio.shield(session.loading)
+            finally:
+                if session.loading.done():
+                    session.loading = None
+        return session.agent
+
+    async def _load_agent(self, session_id: str) -> BaseAgent:
+        """Create an agent for a session and restore any saved history."""
+        pending = self._evictions.get(session_id)
+        if pending is not None:
+            # Don't read the store until a concurrent eviction finished writing it
+            await asyncio.shield(pending)
+
+        agent = self.agent_factory(session_id)
+        # An agent with long-term memory recalls from its whole history; otherwise
+        # only what fits in the window is needed
+        limit = agent.memory.max_messages if agent.long_term_memory is None else None
+        messages = await self.store.load_messages(session_id, limit)
+        if messages is not None:
+            agent.load_history(messages)
+        return agent
+
+    async def _run_session(self, session: _Session) -> None:
+        """Drain a session's inbox one message at a time."""
+        while not session.inbox.empty():
+            message, token, future = session.inbox.get_nowait()
+            # The caller gave up or its deadline passed while the message was queued
+            if future.done() or (token is not None and token.cancelled):
+                continue
+            try:
+                agent = await self._ensure_agent(session)
+                if self._scheduler is None:
+                    response = await agent.process_message(message, cancel_token=token)
+                else:
+                    async with self._scheduler:
+                        response = await agent.process_message(message, cancel_token=token)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Error in session {session.session_id}: {e}", exc_info=True)
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(response)
+                if self.store.incremental:
+                    await self._write_session(session)
+            finally:
+                session.last_active = time.monotonic()
+        self._enforce_capacity()
+
+    def _schedule_eviction(self, session_id: str) -> asyncio.Task:
+        """Remove a session from memory and save it to the store in the background."""
+        session = self._sessions.pop(session_id)
+        previous = self._evictions.get(session_id)
+        task = asyncio.create_task(self._save_session(session, previous))
+        self._evictions[session_id] = task
+        task.add_done_callback(lambda t: self._eviction_done(session_id, t))
+        return task
+
+    def _eviction_done(self, session_id: str, task: asyncio.Task) -> None:
+        """Forget a finished eviction unless a newer one replaced it."""
+        if self._evictions.get(session_id) is task:
+            del self._evictions[session_id]
+
+    async def _save_session(self, session: _Session, previous: Optional[asyncio.Task]) -> None:
+        """Write an evicted session's history to the store."""
+        if previous is not None:
+            await asyncio.shield(previous)
+        await self._write_session(session)
+
+    async def _write_session(self, session: _Session) -> None:
+        """Write a session's messages to the store, logging failures."""
+        if session.agent is None:
+            return
+        memory = session.agent.memory
+        try:
+            await self.store.save_messages(session.session_id, list(memory), memory.appended)
+        except Exception as e:
+            logger.error(f"Failed to save session {session.session_id}: {e}", exc_info=True)
+
+    async def evict(self, session_id: str) -> bool:
+        """Evict a session to the store if it is idle."""
+        session = self._sessions.get(session_id)
+        if session is None or not session.idle:
+            return False
+        await self._schedule_eviction(session_id)
+        return True
+
+    async def evict_idle(self, max_idle: Optional[float] = None) -> int:
+        """Evict every idle session inactive for at least ``max_idle`` seconds.
+
+        Returns:
+            The number of evicted sessions
+        """
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        if max_idle is None:
+            return 0
+        cutoff = time.monotonic() - max_idle
+        tasks: List[asyncio.Task] = []
+        # Sessions are ordered by last use, so stop at the first recent one
+        for session_id, session in list(self._sessions.items()):
+            if session.last_active > cutoff:
+                break
+            if session.idle:
+                tasks.append(self._schedule_eviction(session_id))
+        if tasks:
+            await asyncio.gather(*tasks)
+        return len(tasks)
+
+    async def _sweep(self) -> None:
+        """Periodically evict idle sessions."""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Idle session sweep failed: {e}", exc_info=True)
+
+    def start(self) -> None:
+        """Start the background sweep that evicts idle sessions."""
+        if self.idle_timeout is not None and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def close(self) -> None:
+        """Stop the sweeper, finish queued work and save every session to the store."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+        workers = [s.worker for s in self._sessions.values() if s.worker and not s.worker.done()]
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        tasks = [self._schedule_eviction(session_id) for session_id in list(self._sessions)]
+        tasks.extend(self._evictions.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __aenter__(self) -> 'AgentManager':
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,248 @@
+"""
+LLM Backend Implementation
+
+This module provides the interface agents use to generate text, a local echo
+backend, and an HTTP backend that talks to a generation server through a
+shared, pooled client with retries and backoff.
+"""
+import asyncio
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from .messages import Message, MessageRole, join_json_messages
+from .base_agent import ToolManifest
+from .prefix_registry import PrefixRegistry, default_prefix_registry
+from .http_client import AsyncHTTPClient, HTTPError, get_shared_client
+
+logger = logging.getLogger(__name__)
+
+# A single generation request: the conversation and the available tools
+GenerationRequest = Tuple[Sequence[Message], Optional[List[Dict[str, Any]]]]
+
+class BackendError(Exception):
+    """Raised when a backend fails to generate a response."""
+    pass
+
+class LLMBackend(ABC):
+    """Base class for text generation backends."""
+
+    @abstractmethod
+    async def generate(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Generate a complete response to the conversation."""
+        pass
+
+    async def stream(self, messages: Sequence[Message],
+                     tools: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[str]:
+        """Generate a response as a stream of content chunks.
+
+        Backends that can produce partial output should override this; the
+        default yields the whole response of ``generate`` at once.
+        """
+        yield await self.generate(messages, tools)
+
+    async def generate_batch(self, requests: List[GenerationRequest]) -> List[Union[str, Exception]]:
+        """Generate responses for several conversations in one call.
+
+        Returns:
+            One response per request, in order, or the exception that request raised.
+            Backends with a native batch API should override this; the default
+            runs the requests concurrently.
+        """
+        return list(await asyncio.gather(
+            *(self.generate(messages, tools) for messages, tools in requests),
+            return_exceptions=True
+        ))
+
+    async def close(self) -> None:
+        """Release any resources held by the backend."""
+        pass
+
+class EchoBackend(LLMBackend):
+    """A local backend that echoes the last user message, for demos and tests."""
+
+    def _reply(self, messages: Sequence[Message]) -> str:
+        last_message = messages[-1] if messages else None
+        if last_message and last_message.role == MessageRole.USER:
+            return f"You said: {last_message.content}"
+        return "I'm not sure how to respond to that."
+
+    async def generate(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        return self._reply(messages)
+
+    async def stream(self, messages: Sequence[Message],
+                     tools: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[str]:
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+class HTTPBackend(LLMBackend):
+    """A backend that calls a JSON generation API over HTTP.
+
+    The server receives ``POST {base_url}/v1/generate`` with a body of the form
+    ``{"messages": [...], "tools": [...], "stream": bool}``. It answers with
+    ``{"content": "..."}``, or when streaming with newline-delimited JSON
+    objects of the form ``{"delta": "..."}``. Batches go to
+    ``POST {base_url}/v1/generate_batch`` as ``{"requests": [{"messages": [...],
+    "tools": [...]}, ...]}`` and are answered with ``{"results": [...]}`` holding
+    one ``{"content": "..."}`` or ``{"error": "..."}`` object per request.
+
+    When the conversation starts with system messages interned in the prefix
+    registry, requests also carry ``"prefix_hash"``, a stable hash of that
+    prefix that servers can use to cache the processed prompt.
+
+    Requests go through a pooled keep-alive client that is shared by every
+    backend in the process unless one is passed in. Connection errors, 429 and
+    5xx responses are retried with exponential backoff and jitter; a stream is
+    only retried if it failed before its first chunk.
+    """
+
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(
+        self,
+        base_url: str,
+        client: Optional[AsyncHTTPClient] = None,
+        max_retries: int = 3,
+        backoff: float = 0.1,
+        max_backoff: float = 5.0,
+        max_concurrency: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+        prefix_registry: Optional[PrefixRegistry] = None
+    ):
+        """Initialize the backend.
+
+        Args:
+            base_url: Root URL of the generation server
+            client: HTTP client to use (the shared client by default)
+            max_retries: Number of retries after a failed attempt
+            backoff: Initial delay in seconds between retries, doubled each time
+            max_backoff: Maximum delay between retries
+            max_concurrency: Maximum number of requests this backend sends at once
+            headers: Extra headers sent with every request
+            prefix_registry: Registry of interned prompt prefixes (the shared default if not given)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self._limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.prefix_registry = prefix_registry if prefix_registry is not None else default_prefix_registry
+
+    def _client(self) -> AsyncHTTPClient:
+        return self.client if self.client is not None else get_shared_client()
+
+    def _request_json(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]]) -> bytes:
+        """Encode the fields of one request, reusing cached message and tool manifest JSON."""
+        if isinstance(tools, ToolManifest):
+            tools_json = tools.json
+        else:
+            tools_json = json.dumps(tools or [], separators=(",", ":")).encode("utf-8")
+        system = 0
+        while system < len(messages) and messages[system].role == MessageRole.SYSTEM:
+            system += 1
+        prefix = self.prefix_registry.lookup(messages[:system]) if system else None
+        if prefix is None:
+            return b'"messages":' + join_json_messages(messages) + b',"tools":' + tools_json
+        return (b'"messages":' + prefix.join_json(messages[system:]) + b',"tools":' + tools_json
+                + b',"prefix_hash":"' + prefix.hash.encode("ascii") + b'"')
+
+    def _body(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]], stream: bool) -> bytes:
+        """Build the request body."""
+        return (b"{" + self._request_json(messages, tools)
+                + b',"stream":' + (b"true" if stream else b"false") + b"}")
+
+    async def _sleep_before_retry(self, attempt: int, error: Exception) -> None:
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        delay *= random.uniform(0.5, 1.0)
+        logger.warning(f"Generation request failed ({error}); retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def _stream_events(self, body: bytes, streaming: bool,
+                             endpoint: str = "/v1/generate") -> AsyncIterator[Dict[str, Any]]:
+        """Send a request and yield the JSON objects of the response, with retries.
+
+        A streamed response is read as newline-delimited JSON, any other
+        response as a single JSON document.
+        """
+        url = f"{self.base_url}{endpoint}"
+        attempt = 0
+        while True:
+            started = False
+            try:
+                buffer = b""
+                async with aclosing(self._client().stream("POST", url, body, self.headers)) as response:
+                    async for status, _, chunk in response:
+                        if status >= 400:
+                            raise HTTPError(f"Generation server returned {status}", status)
+                        buffer += chunk
+                        if not streaming:
+                            continue
+                        *lines, buffer = buffer.split(b"\n")
+                        for line in lines:
+                            if line.strip():
+                                started = True
+                                yield json.loads(line)
+                if buffer.strip():
+                    yield json.loads(buffer)
+                return
+            except (HTTPError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, HTTPError) or e.status is None or e.status in self.RETRY_STATUSES
+                if started or not retryable or attempt >= self.max_retries:
+                    raise BackendError(f"Generation request failed: {e}") from e
+                await self._sleep_before_retry(attempt, e)
+                attempt += 1
+            except ValueError as e:
+                raise BackendError(f"Generation server returned invalid JSON: {e}") from e
+
+    async def _limited_events(self, body: bytes, streaming: bool,
+                              endpoint: str = "/v1/generate") -> AsyncIterator[Dict[str, Any]]:
+        if self._limit is None:
+            async with aclosing(self._stream_events(body, streaming, endpoint)) as events:
+                async for event in events:
+                    yield event
+            return
+        async with self._limit:
+            async with aclosing(self._stream_events(body, streaming, endpoint)) as events:
+                async for event in events:
+                    yield event
+
+    async def generate(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        body = self._body(messages, tools, stream=False)
+        async with aclosing(self._limited_events(body, streaming=False)) as events:
+            async for event in events:
+                return event.get("content", "")
+        raise BackendError("Generation server returned an empty response")
+
+    async def stream(self, messages: Sequence[Message],
+                     tools: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[str]:
+        body = self._body(messages, tools, stream=True)
+        async with aclosing(self._limited_events(body, streaming=True)) as events:
+            async for event in events:
+                delta = event.get("delta")
+                if delta:
+                    yield delta
+
+    async def generate_batch(self, requests: List[GenerationRequest]) -> List[Union[str, Exception]]:
+        body = b'{"requests":[' + b",".join(
+            b"{" + self._request_json(messages, tools) + b"}" for messages, tools in requests
+        ) + b"]}"
+        async with aclosing(self._limited_events(body, False, "/v1/generate_batch")) as events:
+            async for event in events:
+                results = event.get("results", [])
+                if len(results) != len(requests):
+                    raise BackendError(f"Expected {len(requests)} batch results, got {len(results)}")
+                return [
+                    BackendError(result["error"]) if "error" in result else result.get("content", "")
+                    for result in results
+                ]
+        raise BackendError("Generation server returned an empty response")
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
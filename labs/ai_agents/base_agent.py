@@ -4,14 +4,24 @@ Base Agent Implementation
 This module provides the base classes for creating AI agents.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Callable, TypeVar, Generic, Type
+from typing import Dict, Any, Iterable, List, Optional, Callable, TypeVar, Generic, Type, AsyncIterator, TYPE_CHECKING
 from dataclasses import dataclass, field
 from enum import Enum, auto
+import copy
+import itertools
 import json
 import logging
+import time
+
+from .messages import MessageRole, Message, join_json_messages
+from .memory import ConversationWindow, estimate_tokens
+from .metrics import MetricsRegistry, default_registry, COUNT_BUCKETS, BYTE_BUCKETS
+from .cancellation import CancellationToken, OperationCancelled, bind_token, unbind_token
+from .prefix_registry import Prefix, PrefixRegistry, default_prefix_registry
+
+if TYPE_CHECKING:
+    from .vector_memory import VectorMemory
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AgentState(Enum):
@@ -22,45 +32,62 @@ class AgentState(Enum):
     WAITING = auto()
     ERROR = auto()
 
-class MessageRole(Enum):
-    """Roles for message senders in the conversation."""
-    SYSTEM = "system"
-    USER = "user"
-    ASSISTANT = "assistant"
-    TOOL = "tool"
+class ToolError(Exception):
+    """Raised when a tool fails to execute."""
+    pass
+
+@dataclass
+class ToolCall:
+    """A request to execute a tool with the given parameters."""
+    id: str
+    tool_name: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
-class Message:
-    """A message in the conversation."""
-    role: MessageRole
-    content: str
-    name: Optional[str] = None
-    tool_call_id: Optional[str] = None
+class ToolResult:
+    """The outcome of executing a single tool call."""
+    call_id: str
+    status: str
+    result: Any = None
+    error: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert message to dictionary format."""
-        result = {
-            "role": self.role.value,
-            "content": self.content
-        }
-        if self.name:
-            result["name"] = self.name
-        if self.tool_call_id:
-            result["tool_call_id"] = self.tool_call_id
-        return result
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Message':
-        """Create a message from a dictionary."""
-        return cls(
-            role=MessageRole(data["role"]),
-            content=data["content"],
-            name=data.get("name"),
-            tool_call_id=data.get("tool_call_id")
-        )
+        """Convert the result to dictionary format."""
+        data = {"call_id": self.call_id, "status": self.status}
+        if self.status == "success":
+            data["result"] = self.result
+        else:
+            data["error"] = self.error
+        return data
 
 class Tool(ABC):
-    """Base class for tools that agents can use."""
+    """Base class for tools that agents can use.
+    
+    Subclasses may set ``max_concurrency`` to cap how many calls of this tool
+    run at once and ``timeout`` (in seconds) to bound each call. Tools whose
+    results depend only on their parameters may set ``cacheable`` so agents
+    with a result cache reuse them for ``cache_ttl`` seconds. Such tools may
+    also set ``coalesce`` so identical calls that are in flight at the same
+    time share one execution, even across agents; calls are matched by tool
+    class, name and parameters, so instances of such a tool must be
+    interchangeable. Tools with side effects must not set it.
+    
+    ``execution_mode`` selects where calls run: ``"async"`` awaits ``execute``
+    in the event loop, ``"thread"`` runs ``run`` in a shared thread pool (for
+    blocking I/O) and ``"process"`` runs ``run`` in a shared process pool (for
+    CPU-bound work). Process mode is opt-in and only pays off for calls that
+    take much longer than sending them to another process. Process-mode tools
+    and their parameters must be picklable, and since workers are started
+    with ``spawn``, a script using them must guard its entry point with
+    ``if __name__ == "__main__":``.
+    """
+    
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+    cacheable: bool = False
+    cache_ttl: Optional[float] = None
+    coalesce: bool = False
+    execution_mode: str = "async"
     
     @property
     @abstractmethod
@@ -86,6 +113,33 @@ class Tool(ABC):
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with the given parameters."""
         pass
+    
+    def run(self, **kwargs) -> Any:
+        """Execute the tool synchronously, for the thread and process execution modes."""
+        raise NotImplementedError(f"Tool {self.name} doesn't support synchronous execution")
+
+class ToolManifest(list):
+    """The schemas of an agent's tools, built once per change to its toolset.
+    
+    It is a list of ``{"name", "description", "parameters"}`` dicts that also
+    carries the ``version`` of the toolset it was built from and the same list
+    pre-serialized as compact UTF-8 ``json``. Manifests are shared, so treat
+    them as read-only.
+    """
+    
+    __slots__ = ('version', 'json')
+    
+    def __init__(self, tools: List[Tool], version: int):
+        super().__init__(
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.parameters
+            }
+            for tool in tools
+        )
+        self.version = version
+        self.json = json.dumps(self, separators=(",", ":")).encode("utf-8")
 
 T = TypeVar('T', bound='BaseAgent')
 
@@ -97,6 +151,12 @@ class BaseAgent(ABC, Generic[T]):
         name: str,
         description: str = "",
         system_prompt: str = "You are a helpful AI assistant.",
+        max_history: Optional[int] = None,
+        max_history_tokens: Optional[int] = None,
+        token_counter: Callable[[Message], int] = estimate_tokens,
+        metrics: Optional[MetricsRegistry] = None,
+        long_term_memory: Optional['VectorMemory'] = None,
+        prefix_registry: Optional[PrefixRegistry] = None,
         **kwargs
     ):
         """Initialize the agent.
@@ -105,17 +165,75 @@ class BaseAgent(ABC, Generic[T]):
             name: Name of the agent
             description: Description of the agent's purpose
             system_prompt: Initial system message to guide the agent's behavior
+            max_history: Maximum number of messages kept in memory (None for no limit)
+            max_history_tokens: Token budget for memory as measured by ``token_counter``
+            token_counter: Function returning the token cost of a message
+            metrics: Registry receiving the agent's metrics (the shared default if not given)
+            long_term_memory: Retrieval memory that every message is also added to
+            prefix_registry: Registry interning system messages shared between
+                agents (the shared default if not given)
         """
         self.name = name
         self.description = description
-        self.state = AgentState.IDLE
-        self.memory: List[Message] = []
+        self.metrics = metrics if metrics is not None else default_registry
+        # Look up histograms once so recording on the hot path is a single observe()
+        self._state_histograms = {
+            state: self.metrics.histogram(
+                "agent_state_seconds", {"state": state.name.lower()},
+                help="Time spent in each agent state"
+            )
+            for state in AgentState
+        }
+        self._turn_histogram = self.metrics.histogram(
+            "agent_turn_seconds", help="Time to process a message"
+        )
+        self._history_histogram = self.metrics.histogram(
+            "agent_history_messages", buckets=COUNT_BUCKETS,
+            help="Messages in memory when a message is processed"
+        )
+        self._payload_histogram = self.metrics.histogram(
+            "agent_payload_bytes", buckets=BYTE_BUCKETS,
+            help="Size of the serialized conversation payload"
+        )
+        self._serialize_histogram = self.metrics.histogram(
+            "agent_serialize_seconds", help="Time to serialize the conversation payload"
+        )
+        self._state = AgentState.IDLE
+        self._state_since = time.perf_counter()
+        self.memory = ConversationWindow(
+            max_tokens=max_history_tokens,
+            max_messages=max_history,
+            token_counter=token_counter
+        )
+        self.long_term_memory = long_term_memory
+        self.prefix_registry = prefix_registry if prefix_registry is not None else default_prefix_registry
+        self._prompt_prefix: Optional[Prefix] = None
         self.tools: Dict[str, Tool] = {}
+        self._tools_version = 0
+        self._tool_manifest: Optional[ToolManifest] = None
         self._register_tools()
         
-        # Add system prompt if provided
+        # Add system prompt if provided, sharing one copy between agents with the same prompt
         if system_prompt:
-            self.memory.append(Message(role=MessageRole.SYSTEM, content=system_prompt))
+            self._prompt_prefix = self.prefix_registry.intern(
+                [Message(role=MessageRole.SYSTEM, content=system_prompt)]
+            )
+            self.memory.replace_pinned(self._prompt_prefix.messages)
+    
+    @property
+    def state(self) -> AgentState:
+        """The agent's current state."""
+        return self._state
+    
+    @state.setter
+    def state(self, value: AgentState) -> None:
+        """Change state, recording how long the agent spent in the previous one."""
+        if value is self._state:
+            return
+        now = time.perf_counter()
+        self._state_histograms[self._state].observe(now - self._state_since)
+        self._state = value
+        self._state_since = now
     
     def _register_tools(self) -> None:
         """Register any tools this agent should have access to."""
@@ -126,46 +244,188 @@ class BaseAgent(ABC, Generic[T]):
         if tool.name in self.tools:
             logger.warning(f"Tool with name '{tool.name}' already exists. Overwriting.")
         self.tools[tool.name] = tool
+        self.invalidate_tool_manifest()
     
     def remove_tool(self, tool_name: str) -> bool:
         """Remove a tool from the agent's toolset."""
         if tool_name in self.tools:
             del self.tools[tool_name]
+            self.invalidate_tool_manifest()
             return True
         return False
     
+    def _remember(self, message: Message) -> None:
+        """Add a message to memory and, if configured, to long-term memory."""
+        self.memory.append(message)
+        if self.long_term_memory is not None:
+            self.long_term_memory.add(message)
+    
     def get_tool(self, tool_name: str) -> Optional[Tool]:
         """Get a tool by name."""
         return self.tools.get(tool_name)
     
+    def invalidate_tool_manifest(self) -> None:
+        """Discard the cached tool manifest.
+        
+        ``add_tool`` and ``remove_tool`` call this; call it directly after
+        changing ``self.tools`` or a tool's schema in any other way.
+        """
+        self._tools_version += 1
+        self._tool_manifest = None
+    
+    @property
+    def tool_manifest(self) -> ToolManifest:
+        """The manifest of the current toolset, built on first use after a change."""
+        if self._tool_manifest is None:
+            self._tool_manifest = ToolManifest(list(self.tools.values()), self._tools_version)
+        return self._tool_manifest
+    
+    @property
+    def prompt_prefix(self) -> Optional[Prefix]:
+        """The interned prefix of pinned system messages, if there is one.
+        
+        Its ``hash`` identifies the prompt prefix for backends that cache
+        prompts. Pinned messages added since the last prompt was built are
+        only interned by the next one, so this is None until then.
+        """
+        pinned = self.memory.pinned
+        prefix = self._prompt_prefix
+        if prefix is not None and prefix.messages is pinned:
+            return prefix
+        return self.prefix_registry.lookup(pinned) if pinned else None
+    
+    def _intern_prompt_prefix(self) -> Optional[Prefix]:
+        """Intern the pinned system messages and return their prefix.
+        
+        Pinned messages that aren't interned yet are replaced with the
+        registry's shared copies, so backends can identify the shared prefix.
+        """
+        pinned = self.memory.pinned
+        if not pinned:
+            return None
+        prefix = self._prompt_prefix
+        if prefix is None or prefix.messages is not pinned:
+            prefix = self._prompt_prefix = self.prefix_registry.intern(pinned)
+            self.memory.replace_pinned(prefix.messages)
+        return prefix
+    
+    def load_history(self, messages: Iterable[Message]) -> None:
+        """Replace the conversation memory with ``messages``."""
+        self.memory.clear()
+        if self.long_term_memory is not None:
+            self.long_term_memory.clear()
+        for message in messages:
+            self._remember(message)
+        self._prompt_prefix = None
+    
     def get_available_tools(self) -> List[Dict[str, Any]]:
-        """Get a list of available tools and their schemas."""
-        return [
-            {
-                "name": tool.name,
-                "description": tool.description,
-                "parameters": tool.parameters
-            }
-            for tool in self.tools.values()
-        ]
+        """Get a list of available tools and their schemas.
+        
+        This is the cached ``tool_manifest``, so treat it as read-only.
+        """
+        return self.tool_manifest
     
-    async def process_message(self, message: Message) -> Message:
-        """Process an incoming message and generate a response."""
+    async def process_message(
+        self,
+        message: Message,
+        *,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Message:
+        """Process an incoming message and generate a response.
+        
+        Args:
+            message: The incoming message
+            timeout: Seconds allowed for the whole turn
+            cancel_token: Token that stops the turn when it fires
+        
+        The token (combined with ``timeout``) is current while the response is
+        generated, so tools and backends can check it and tool timeouts are
+        capped by its deadline. If it fires, generation and in-flight tool
+        calls are cancelled, pending tool calls are dropped and the agent
+        returns to IDLE with an explanatory response that isn't kept in memory.
+        """
+        token = CancellationToken(timeout, parent=cancel_token) if timeout is not None else cancel_token
+        started = time.perf_counter()
         self.state = AgentState.THINKING
-        self.memory.append(message)
+        self._remember(message)
+        self._history_histogram.observe(len(self.memory))
         
+        reset = bind_token(token) if token is not None else None
         try:
-            response = await self._generate_response()
-            self.memory.append(response)
+            if token is None:
+                response = await self._generate_response()
+            else:
+                response = await token.run(self._generate_response())
+            self._remember(response)
             self.state = AgentState.IDLE
+            self._turn_histogram.observe(time.perf_counter() - started)
             return response
+        except OperationCancelled as e:
+            self._cancel_pending_work()
+            self.state = AgentState.IDLE
+            reason = "deadline" if e.reason == "deadline exceeded" else "cancelled"
+            self.metrics.inc("agent_cancelled_total", {"reason": reason}, help="Turns stopped by cancellation")
+            logger.warning(f"Stopped processing message: {e.reason}")
+            return Message(
+                role=MessageRole.ASSISTANT,
+                content=f"I stopped before finishing: {e.reason}"
+            )
         except Exception as e:
             self.state = AgentState.ERROR
+            self.metrics.inc("agent_errors_total", {"stage": "process_message"}, help="Failed message processing")
             logger.error(f"Error processing message: {e}", exc_info=True)
             return Message(
                 role=MessageRole.ASSISTANT,
                 content=f"I encountered an error: {str(e)}"
             )
+        finally:
+            if reset is not None:
+                unbind_token(reset)
+            if token is not cancel_token:
+                token.close()
+    
+    def _cancel_pending_work(self) -> None:
+        """Stop work the agent started for a cancelled turn.
+        
+        Subclasses that start background work or queue follow-up work should
+        override this to cancel and drop it.
+        """
+        pass
+    
+    async def process_message_stream(self, message: Message) -> AsyncIterator[str]:
+        """Process an incoming message and yield the response as it is generated.
+        
+        The assembled response is added to memory only once the stream has
+        finished. If the consumer stops early, nothing is added, work started
+        for the turn is cancelled and the agent returns to IDLE.
+        """
+        started = time.perf_counter()
+        self.state = AgentState.THINKING
+        self._remember(message)
+        self._history_histogram.observe(len(self.memory))
+        
+        chunks: List[str] = []
+        completed = False
+        try:
+            async for chunk in self._generate_response_stream():
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+            self._remember(Message(role=MessageRole.ASSISTANT, content="".join(chunks)))
+            self.state = AgentState.IDLE
+            self._turn_histogram.observe(time.perf_counter() - started)
+            completed = True
+        except Exception as e:
+            self.state = AgentState.ERROR
+            self.metrics.inc("agent_errors_total", {"stage": "process_message_stream"}, help="Failed message processing")
+            completed = True
+            logger.error(f"Error processing message: {e}", exc_info=True)
+            yield f"I encountered an error: {str(e)}"
+        finally:
+            if not completed:
+                self._cancel_pending_work()
+                self.state = AgentState.IDLE
     
     @abstractmethod
     async def _generate_response(self) -> Message:
@@ -176,13 +436,80 @@ class BaseAgent(ABC, Generic[T]):
         """
         pass
     
+    async def _generate_response_stream(self) -> AsyncIterator[str]:
+        """Generate a response as a stream of content chunks.
+        
+        Subclasses that can produce partial output should override this; the
+        default yields the whole response of ``_generate_response`` at once.
+        """
+        response = await self._generate_response()
+        yield response.content
+    
     def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get the conversation history in a serializable format."""
+        """Get the conversation history in a serializable format.
+        
+        The dictionaries are cached on each message, so treat them as read-only.
+        """
         return [msg.to_dict() for msg in self.memory]
     
+    def get_conversation_payload(self) -> bytes:
+        """Get the conversation history as a UTF-8 JSON array.
+        
+        Each message is encoded once and the cached bytes are reused, so only
+        messages added since the last call are serialized.
+        """
+        return self._serialize_messages(self.memory)
+    
+    def _serialize_messages(self, messages: Iterable[Message]) -> bytes:
+        """Serialize messages starting with the pinned ones, recording the payload metrics."""
+        started = time.perf_counter()
+        prefix = self._intern_prompt_prefix()
+        if prefix is None:
+            payload = join_json_messages(messages)
+        else:
+            payload = prefix.join_json(itertools.islice(messages, len(prefix), None))
+        self._serialize_histogram.observe(time.perf_counter() - started)
+        self._payload_histogram.observe(len(payload))
+        return payload
+    
+    def _observe_payload(self, messages: Iterable[Message]) -> None:
+        """Record the payload metrics of a prompt without building the payload.
+        
+        Encoding each message caches its JSON for the backend, so the time
+        recorded is the serialization the request actually needs; the size is
+        that of the JSON array the cached encodings join into.
+        """
+        started = time.perf_counter()
+        sizes = [len(message.to_json()) for message in messages]
+        self._serialize_histogram.observe(time.perf_counter() - started)
+        self._payload_histogram.observe(sum(sizes) + max(len(sizes) - 1, 0) + 2)
+    
+    def fork(self, name: Optional[str] = None) -> 'BaseAgent':
+        """Create a child agent that continues this conversation independently.
+        
+        The child shares this agent's history through copy-on-write memory,
+        so forking costs O(1) however long the conversation is. Tools, the
+        backend and metrics are shared; messages added to either agent
+        afterwards are not seen by the other.
+        
+        Args:
+            name: Name of the child (derived from this agent's name by default)
+        """
+        child = copy.copy(self)
+        child.name = name if name is not None else f"{self.name}-fork"
+        child.memory = self.memory.fork()
+        if self.long_term_memory is not None:
+            child.long_term_memory = self.long_term_memory.fork()
+        child.tools = dict(self.tools)
+        child._state = AgentState.IDLE
+        child._state_since = time.perf_counter()
+        return child
+    
     def clear_memory(self) -> None:
-        """Clear the agent's conversation memory."""
-        self.memory = []
+        """Clear the agent's conversation memory, including long-term memory."""
+        self.memory.clear()
+        if self.long_term_memory is not None:
+            self.long_term_memory.clear()
     
     def __str__(self) -> str:
         """Return a string representation of the agent."""
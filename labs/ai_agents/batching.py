@@ -0,0 +1,92 @@
+"""
+Generation Micro-batching Implementation
+
+This module provides a backend wrapper that collects generation requests from
+many agents over a short window and sends them to the wrapped backend as one
+batched call, fanning the results back out to each caller.
+"""
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
+
+from .messages import Message
+from .backends import LLMBackend, BackendError
+
+logger = logging.getLogger(__name__)
+
+class BatchingBackend(LLMBackend):
+    """Micro-batches ``generate`` calls onto a wrapped backend's ``generate_batch``.
+
+    A batch is sent when ``max_batch_size`` requests are waiting or when the
+    oldest waiting request has waited ``max_wait`` seconds, whichever comes
+    first. Share one instance between agents to batch across sessions.
+    Streaming calls are served from the batched result as a single chunk.
+    """
+
+    def __init__(self, backend: LLMBackend, max_batch_size: int = 16, max_wait: float = 0.005):
+        """Initialize the batcher.
+
+        Args:
+            backend: Backend receiving the batched calls
+            max_batch_size: Maximum number of requests per batch
+            max_wait: Longest time in seconds a request waits for its batch to fill
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Sequence[Message], Optional[List[Dict[str, Any]]], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.requests_batched = 0
+
+    async def generate(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((messages, tools, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send everything that is waiting, in batches of at most ``max_batch_size``."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        # Callers that gave up while waiting don't need a response
+        pending = [item for item in pending if not item[2].done()]
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = pending[start:start + self.max_batch_size]
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: List[Tuple[Sequence[Message], Optional[List[Dict[str, Any]]], asyncio.Future]]) -> None:
+        """Run one batch on the wrapped backend and resolve its callers."""
+        self.batches_sent += 1
+        self.requests_batched += len(batch)
+        try:
+            results = await self.backend.generate_batch([(messages, tools) for messages, tools, _ in batch])
+            if len(results) != len(batch):
+                raise BackendError(f"Expected {len(batch)} batch results, got {len(results)}")
+        except Exception as e:
+            logger.error(f"Batched generation failed: {e}", exc_info=True)
+            results = [e] * len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Send anything still waiting, wait for in-flight batches and close the wrapped backend."""
+        if self._pending:
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self.backend.close()
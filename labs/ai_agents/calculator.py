@@ -0,0 +1,221 @@
+"""
+Calculator Engine Implementation
+
+This module provides a safe arithmetic expression evaluator. Expressions are
+validated against a whitelist of AST nodes, compiled once and memoized by
+their text, and can be evaluated over many variable bindings at once using
+NumPy vectorization when NumPy is installed.
+"""
+import ast
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, List, Mapping, Optional, Sequence, Union
+
+from .base_agent import ToolError
+
+# Largest estimated power result in bits, to stop expressions like 9**9**9 or
+# (10**9000)**9000 from hanging
+MAX_RESULT_BITS = 100000
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant
+) + _BINARY_OPERATORS + _UNARY_OPERATORS
+
+_POW_NAME = "__pow__"
+
+def _result_bits(base: Any, exponent: Any) -> float:
+    """Estimate the size in bits of ``base ** exponent``."""
+    magnitude = abs(base)
+    if magnitude <= 1:
+        return 0.0
+    bits = magnitude.bit_length() if isinstance(magnitude, int) else math.log2(magnitude)
+    return bits * abs(exponent)
+
+def _safe_pow(base: Any, exponent: Any) -> Any:
+    """Raise to a power, refusing results too large to compute quickly."""
+    bits = _result_bits(base, exponent)
+    if bits > MAX_RESULT_BITS:
+        raise ToolError(f"Result of ** too large (about {bits:.3g} bits)")
+    return base ** exponent
+
+_SCALAR_NAMESPACE: Dict[str, Any] = {
+    "sqrt": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "log": math.log,
+    "exp": math.exp,
+    "abs": abs,
+    "pi": math.pi,
+    "e": math.e,
+    _POW_NAME: _safe_pow,
+}
+
+@lru_cache(maxsize=None)
+def _load_numpy() -> Optional[Any]:
+    """Import NumPy on first use, so importing this module stays cheap."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - NumPy is optional
+        return None
+    return numpy
+
+def _vector_pow(base: Any, exponent: Any) -> Any:
+    """Raise to a power elementwise, matching ``_safe_pow`` on plain numbers."""
+    np = _load_numpy()
+    if not isinstance(base, np.ndarray) and not isinstance(exponent, np.ndarray):
+        return _safe_pow(base, exponent)
+    # float_power so integer operands with negative exponents give floats, as in Python
+    return np.float_power(base, exponent)
+
+@lru_cache(maxsize=None)
+def _vector_namespace() -> Dict[str, Any]:
+    np = _load_numpy()
+    return {
+        "sqrt": np.sqrt,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "log": np.log,
+        "exp": np.exp,
+        "abs": np.abs,
+        "pi": math.pi,
+        "e": math.e,
+        _POW_NAME: _vector_pow,
+    }
+
+FUNCTIONS: FrozenSet[str] = frozenset(["sqrt", "sin", "cos", "tan", "log", "exp", "abs"])
+CONSTANTS: FrozenSet[str] = frozenset(["pi", "e"])
+
+class _PowRewriter(ast.NodeTransformer):
+    """Route ``**`` through a guarded power function."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(
+                func=ast.Name(id=_POW_NAME, ctx=ast.Load()),
+                args=[node.left, node.right],
+                keywords=[]
+            ), node)
+        return node
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """A validated, compiled arithmetic expression."""
+    source: str
+    code: Any
+    variables: FrozenSet[str]
+
+def _validate(tree: ast.AST) -> FrozenSet[str]:
+    """Check an expression tree against the whitelist and collect its variables."""
+    variables = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ToolError(f"Unsupported syntax in expression: {type(node).__name__}")
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ToolError(f"Unsupported constant in expression: {node.value!r}")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ToolError("Only calls to built-in math functions are allowed")
+            if node.keywords or len(node.args) != 1:
+                raise ToolError(f"{node.func.id}() takes exactly one argument")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ToolError(f"Invalid name in expression: {node.id}")
+            if node.id not in FUNCTIONS and node.id not in CONSTANTS:
+                variables.add(node.id)
+    # Function names are only valid as the target of a call
+    called = {id(n.func) for n in ast.walk(tree) if isinstance(n, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in FUNCTIONS and id(node) not in called:
+            raise ToolError(f"{node.id} must be called")
+    return frozenset(variables)
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Validate and compile an expression, memoized by its text."""
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ToolError(f"Invalid expression: {e.msg}")
+    variables = _validate(tree)
+    tree = ast.fix_missing_locations(_PowRewriter().visit(tree))
+    return CompiledExpression(
+        source=expression,
+        code=compile(tree, "<expression>", "eval"),
+        variables=variables
+    )
+
+def _bind(compiled: CompiledExpression, variables: Mapping[str, Any]) -> Dict[str, Any]:
+    """Select the variables an expression needs, failing on missing ones."""
+    missing = compiled.variables.difference(variables)
+    if missing:
+        raise ToolError(f"Missing values for variables: {', '.join(sorted(missing))}")
+    return {name: variables[name] for name in compiled.variables}
+
+def evaluate(expression: str, variables: Optional[Mapping[str, Any]] = None) -> float:
+    """Evaluate an expression with optional variable values."""
+    compiled = compile_expression(expression)
+    scope = _bind(compiled, variables or {})
+    try:
+        return float(eval(compiled.code, {"__builtins__": {}, **_SCALAR_NAMESPACE}, scope))
+    except ToolError:
+        raise
+    except Exception as e:
+        raise ToolError(f"Error evaluating expression: {e}")
+
+def evaluate_many(
+    expression: str,
+    bindings: Union[Mapping[str, Sequence[Any]], Sequence[Mapping[str, Any]]]
+) -> List[float]:
+    """Evaluate one expression over many variable bindings.
+
+    With NumPy installed the expression is evaluated once over whole arrays;
+    invalid points such as division by zero then yield ``nan`` or ``inf``
+    instead of raising. Without NumPy each binding is evaluated in turn.
+
+    Args:
+        expression: The expression to evaluate
+        bindings: Either a mapping of variable names to equally long sequences
+            of values, or a sequence of per-row variable mappings
+    """
+    compiled = compile_expression(expression)
+    if isinstance(bindings, Mapping):
+        columns = dict(bindings)
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ToolError("All variable arrays must have the same length")
+        count = lengths.pop() if lengths else 0
+    else:
+        rows = list(bindings)
+        count = len(rows)
+        names = compiled.variables
+        try:
+            columns = {name: [row[name] for row in rows] for name in names}
+        except KeyError as e:
+            raise ToolError(f"Missing values for variables: {e.args[0]}")
+
+    np = _load_numpy()
+    if np is None:
+        return [
+            evaluate(expression, {name: values[i] for name, values in columns.items()})
+            for i in range(count)
+        ]
+
+    try:
+        scope = {name: np.asarray(values, dtype=float) for name, values in _bind(compiled, columns).items()}
+    except (TypeError, ValueError) as e:
+        raise ToolError(f"Variable values must be numeric: {e}")
+    try:
+        with np.errstate(all="ignore"):
+            result = eval(compiled.code, {"__builtins__": {}, **_vector_namespace()}, scope)
+            return np.broadcast_to(np.asarray(result, dtype=float), (count,)).tolist()
+    except ToolError:
+        raise
+    except Exception as e:
+        raise ToolError(f"Error evaluating expression: {e}")
@@ -0,0 +1,157 @@
+"""
+Cancellation Implementation
+
+This module provides cancellation tokens with optional deadlines. A token is
+passed to an agent when a message is processed and is visible to everything
+running on its behalf, including generation and tool execution, through a
+context variable.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+class OperationCancelled(Exception):
+    """Raised when work is stopped because its cancellation token fired."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class CancellationToken:
+    """A cancellation signal with an optional deadline.
+
+    A token fires when ``cancel`` is called, when its deadline passes, or when
+    its parent fires. Work bound to it with ``run`` is cancelled at that
+    moment; other code can poll ``cancelled`` or call ``raise_if_cancelled``.
+    Call ``close`` once the work using a token is over, so a long-lived
+    parent doesn't keep it alive and its deadline timer doesn't linger.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional['CancellationToken'] = None):
+        """Initialize the token.
+
+        Args:
+            timeout: Seconds from now until the token fires on its own
+            parent: Token whose firing also fires this one
+        """
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        if parent is not None and parent.deadline is not None:
+            self.deadline = parent.deadline if self.deadline is None else min(self.deadline, parent.deadline)
+        self.reason: Optional[str] = None
+        self._callbacks: List[Callable[[], Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._parent: Optional[CancellationToken] = None
+        if parent is not None:
+            if parent.cancelled:
+                self.cancel(parent.reason)
+            else:
+                self._parent = parent
+                parent.add_callback(self._parent_cancelled)
+
+    def _parent_cancelled(self) -> None:
+        self.cancel(self._parent.reason)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token has fired, checking the deadline."""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline (None without one, 0 once fired)."""
+        if self.cancelled:
+            return 0.0
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: Optional[str] = "cancelled") -> None:
+        """Fire the token, running its callbacks once."""
+        if self.reason is not None:
+            return
+        self.reason = reason or "cancelled"
+        self.close()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def close(self) -> None:
+        """Stop the deadline timer and detach from the parent.
+
+        The token keeps whatever state it has, but it no longer fires because
+        of its parent or, unless polled or used by ``run`` again, its deadline.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._parent is not None:
+            self._parent.remove_callback(self._parent_cancelled)
+            self._parent = None
+
+    def add_callback(self, callback: Callable[[], Any]) -> None:
+        """Call ``callback`` when the token fires (immediately if it already has)."""
+        if self.cancelled:
+            callback()
+        else:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[], Any]) -> None:
+        """Stop a callback from being called."""
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    def raise_if_cancelled(self) -> None:
+        """Raise OperationCancelled if the token has fired."""
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def _arm(self) -> None:
+        """Make the deadline fire the token even if nobody polls it."""
+        if self._timer is None and self.deadline is not None and self.reason is None:
+            delay = max(0.0, self.deadline - time.monotonic())
+            self._timer = asyncio.get_running_loop().call_later(delay, self.cancel, "deadline exceeded")
+
+    async def run(self, awaitable: Awaitable[Any]) -> Any:
+        """Await ``awaitable`` as a task that is cancelled when the token fires.
+
+        Raises:
+            OperationCancelled: If the token fired before the work finished
+        """
+        if self.cancelled:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise OperationCancelled(self.reason)
+        task = asyncio.ensure_future(awaitable)
+        self._arm()
+        self.add_callback(task.cancel)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Only translate cancellations caused by this token, not of the caller itself
+            if self.reason is not None and not asyncio.current_task().cancelling():
+                raise OperationCancelled(self.reason) from None
+            raise
+        finally:
+            self.remove_callback(task.cancel)
+
+    def __repr__(self) -> str:
+        state = f"cancelled={self.reason!r}" if self.reason is not None else f"remaining={self.remaining()}"
+        return f"CancellationToken({state})"
+
+_current_token: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar(
+    "cancellation_token", default=None
+)
+
+def current_token() -> Optional[CancellationToken]:
+    """Get the token of the message being processed in this context, if any."""
+    return _current_token.get()
+
+def bind_token(token: Optional[CancellationToken]) -> contextvars.Token:
+    """Make ``token`` the current token; pass the result to ``unbind_token`` to restore."""
+    return _current_token.set(token)
+
+def unbind_token(reset: contextvars.Token) -> None:
+    """Restore the token that was current before ``bind_token``."""
+    _current_token.reset(reset)
@@ -4,14 +4,21 @@ Conversational Agent Implementation
 This module provides a conversational AI agent that can maintain context and use tools.
 """
 import json
-import uuid
-from typing import Dict, Any, List, Optional, Callable, Awaitable, Union
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Union, AsyncIterator, Sequence
 from dataclasses import dataclass, field
 import logging
 from .base_agent import (
     BaseAgent, Message, MessageRole, AgentState, Tool,
     ToolCall, ToolResult, ToolError
 )
+from .tool_executor import ToolExecutor
+from .tool_cache import ToolResultCache
+from .single_flight import SingleFlight, get_shared_single_flight
+from .tool_parser import ToolCallParser, parse_tool_calls
+from .tool_plan import ToolPlan, find_refs, rewrite_refs, run_after
+from .backends import LLMBackend, EchoBackend
+from . import calculator
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +31,15 @@ class ConversationalAgent(BaseAgent):
         description: str = "A helpful AI assistant",
         system_prompt: str = "You are a helpful AI assistant.",
         max_history: int = 20,
+        concurrent_tools: bool = True,
+        max_concurrent_tools: Optional[int] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+        tool_timeout: Optional[float] = None,
+        tool_cache: Optional[ToolResultCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        speculative_tools: bool = True,
+        backend: Optional[LLMBackend] = None,
+        recall_k: int = 4,
         **kwargs
     ):
         """Initialize the conversational agent.
@@ -33,91 +49,141 @@ class ConversationalAgent(BaseAgent):
             description: Description of the agent's purpose
             system_prompt: Initial system message to guide the agent's behavior
             max_history: Maximum number of messages to keep in history
+            concurrent_tools: Run pending tool calls concurrently instead of one by one
+            max_concurrent_tools: Maximum number of tool calls running at once
+            tool_concurrency: Per-tool concurrency limits keyed by tool name
+            tool_timeout: Default per-call timeout in seconds for tool execution
+            tool_cache: Result cache for cacheable tools, which may be shared between agents
+            single_flight: Group coalescing identical in-flight calls of tools that
+                set ``coalesce`` (the process-wide group by default, so agents sharing
+                a tool instance coalesce its calls across sessions)
+            speculative_tools: Start each tool call as soon as it has been generated
+            backend: Text generation backend (an echo backend by default)
+            recall_k: Number of earlier messages recalled from ``long_term_memory``
+                into each prompt
         """
-        super().__init__(name, description, system_prompt, **kwargs)
+        super().__init__(name, description, system_prompt, max_history=max_history, **kwargs)
         self.max_history = max_history
+        self.speculative_tools = speculative_tools
+        self.backend = backend if backend is not None else EchoBackend()
+        self.recall_k = recall_k
         self._pending_tool_calls: Dict[str, ToolCall] = {}
+        self._inflight_tool_calls: Dict[str, asyncio.Future] = {}
+        # In-flight entries wrapping a task shared with forks, and the number of
+        # agents still holding each such task (one dict for a whole fork family)
+        self._shared_tool_tasks: Dict[asyncio.Future, asyncio.Task] = {}
+        self._tool_task_holders: Dict[asyncio.Task, int] = {}
+        self.tool_executor = ToolExecutor(
+            concurrent=concurrent_tools,
+            max_concurrency=max_concurrent_tools,
+            tool_concurrency=tool_concurrency,
+            default_timeout=tool_timeout,
+            cache=tool_cache,
+            metrics=self.metrics,
+            single_flight=single_flight if single_flight is not None else get_shared_single_flight()
+        )
     
     async def _generate_response(self) -> Message:
         """Generate a response based on the conversation context."""
+        chunks = [chunk async for chunk in self._generate_response_stream()]
+        return Message(role=MessageRole.ASSISTANT, content="".join(chunks))
+    
+    async def _generate_response_stream(self) -> AsyncIterator[str]:
+        """Generate a response as a stream of content chunks.
+        
+        Text is passed through as soon as it is generated. Tool calls are
+        parsed out of the stream incrementally; each one is queued (and, with
+        ``speculative_tools``, started) as soon as its JSON arguments are
+        complete, and a notice listing the called tools ends the response.
+        A call may use an earlier call's result as a parameter by passing
+        ``{"$ref": n}`` for the n-th call of the response (see ``tool_plan``);
+        it starts once that result is available.
+        """
         # Check for any pending tool calls that need to be processed
         tool_responses = await self._process_pending_tool_calls()
         if tool_responses:
             # If we have tool responses, return them
-            return Message(
-                role=MessageRole.ASSISTANT,
-                content=json.dumps({"tool_responses": tool_responses})
-            )
+            yield json.dumps({"tool_responses": tool_responses})
+            return
         
-        # Generate a response using the conversation history
-        response = await self._generate_text_response()
+        parser = ToolCallParser()
+        tool_calls: List[Dict[str, Any]] = []
+        emitted_text = False
+        async for chunk in self._generate_text_response_stream():
+            for event in parser.feed(chunk):
+                if isinstance(event, dict):
+                    self._dispatch_tool_call(event, [call["id"] for call in tool_calls])
+                    tool_calls.append(event)
+                elif event:
+                    emitted_text = emitted_text or not event.isspace()
+                    yield event
+        for event in parser.close():
+            emitted_text = emitted_text or not event.isspace()
+            yield event
         
-        # Check if the response includes tool calls
-        tool_calls = self._extract_tool_calls(response.content)
         if tool_calls:
-            self._queue_tool_calls(tool_calls)
-            # Return a message indicating tools are being called
+            # Finish with a notice indicating tools are being called
             tool_names = ", ".join([t["name"] for t in tool_calls])
-            return Message(
-                role=MessageRole.ASSISTANT,
-                content=f"I'm executing the following tools: {tool_names}"
-            )
-        
-        return response
+            separator = "\n" if emitted_text else ""
+            yield f"{separator}I'm executing the following tools: {tool_names}"
     
     async def _generate_text_response(self) -> Message:
-        """Generate a text response based on the conversation context.
+        """Generate a text response based on the conversation context."""
+        chunks = [chunk async for chunk in self._generate_text_response_stream()]
+        return Message(role=MessageRole.ASSISTANT, content="".join(chunks))
+    
+    async def _generate_text_response_stream(self) -> AsyncIterator[str]:
+        """Generate a text response as a stream of content chunks from the backend."""
+        async for chunk in self.backend.stream(self._build_prompt(), self.get_available_tools()):
+            yield chunk
+    
+    def _build_prompt(self) -> List[Message]:
+        """Build the list of messages sent to the backend.
         
-        In a real implementation, this would call an LLM API. This is a placeholder
-        that demonstrates the expected behavior.
+        With a long-term memory, the earlier messages most relevant to the
+        latest user message are recalled and placed, in their original order,
+        between the system messages and the recent history. The payload size
+        and encoding time are recorded from each message's cached JSON.
         """
-        # This is a simplified implementation. In practice, you would call an LLM API here.
-        last_message = self.memory[-1] if self.memory else None
-        
-        if last_message and last_message.role == MessageRole.USER:
-            # Simple echo response for demonstration
-            return Message(
-                role=MessageRole.ASSISTANT,
-                content=f"You said: {last_message.content}"
-            )
-        
-        return Message(
-            role=MessageRole.ASSISTANT,
-            content="I'm not sure how to respond to that."
-        )
+        self._intern_prompt_prefix()
+        messages = list(self.memory)
+        if self.long_term_memory is not None and self.recall_k:
+            query = next((m for m in reversed(messages) if m.role == MessageRole.USER), None)
+            recalled = self.long_term_memory.recall(query.content, self.recall_k, exclude=messages) if query else []
+            if recalled:
+                pinned = len(self.memory.pinned)
+                messages = messages[:pinned] + recalled + messages[pinned:]
+        self._observe_payload(messages)
+        return messages
     
     def _extract_tool_calls(self, response_text: str) -> List[Dict[str, Any]]:
-        """Extract tool calls from the agent's response.
+        """Extract every tool call of the form ``TOOL: name {params}`` from a response."""
+        return parse_tool_calls(response_text)
+    
+    def _queue_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        earlier_ids: Sequence[str] = ()
+    ) -> List[ToolCall]:
+        """Queue tool calls for execution and return the ones that were queued.
         
-        In a real implementation, this would parse the LLM's response to identify
-        tool calls. For this example, we'll look for a specific pattern.
+        Positional references (``{"$ref": n}``) are rewritten to the ID of the
+        n-th call, counting ``earlier_ids`` (calls already seen in the same
+        response) and then ``tool_calls``.
         """
-        # This is a simplified implementation
-        tool_calls = []
+        call_ids = list(earlier_ids)
         
-        # Look for patterns like "TOOL: tool_name {params}"
-        if response_text.startswith("TOOL:"):
-            try:
-                parts = response_text.split(" ", 2)
-                if len(parts) >= 3:
-                    tool_name = parts[1].strip()
-                    tool_params = json.loads(parts[2].strip())
-                    tool_calls.append({
-                        "name": tool_name,
-                        "parameters": tool_params,
-                        "id": f"call_{uuid.uuid4().hex}"
-                    })
-            except (json.JSONDecodeError, IndexError) as e:
-                logger.warning(f"Failed to parse tool call: {e}")
+        def to_call_id(ref: Any) -> Any:
+            if isinstance(ref, int) and not isinstance(ref, bool) and 1 <= ref <= len(call_ids):
+                return call_ids[ref - 1]
+            return ref
         
-        return tool_calls
-    
-    def _queue_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> None:
-        """Queue tool calls for execution."""
+        queued = []
         for tool_call in tool_calls:
             call_id = tool_call["id"]
             tool_name = tool_call["name"]
-            parameters = tool_call.get("parameters", {})
+            parameters = rewrite_refs(tool_call.get("parameters", {}), to_call_id)
+            call_ids.append(call_id)
             
             if tool_name not in self.tools:
                 logger.warning(f"Unknown tool: {tool_name}")
@@ -128,57 +194,132 @@ class ConversationalAgent(BaseAgent):
                 tool_name=tool_name,
                 parameters=parameters
             )
+            queued.append(self._pending_tool_calls[call_id])
+        return queued
+    
+    def _dispatch_tool_call(self, tool_call: Dict[str, Any], earlier_ids: Sequence[str] = ()) -> None:
+        """Queue a tool call and, if speculative, start executing it right away.
+        
+        A call referencing other calls is started speculatively only if all of
+        them are already running; it then waits for their results.
+        """
+        for queued in self._queue_tool_calls([tool_call], earlier_ids):
+            if not self.speculative_tools:
+                continue
+            refs = find_refs(queued.parameters)
+            if not all(ref in self._inflight_tool_calls for ref in refs):
+                continue
+            dependencies = {ref: self._inflight_tool_calls[ref] for ref in refs}
+            self._inflight_tool_calls[queued.id] = asyncio.ensure_future(
+                run_after(queued, dependencies, self._run_tool_call)
+            )
+    
+    async def _run_tool_call(self, tool_call: ToolCall) -> ToolResult:
+        """Execute a single tool call with the agent's executor."""
+        return await self.tool_executor.run_one(self.tools.get(tool_call.tool_name), tool_call)
+    
+    def _hold_tool_task(self, task: asyncio.Task) -> asyncio.Future:
+        """Get this agent's handle on a tool call task shared with forks."""
+        handle = asyncio.shield(task)
+        self._shared_tool_tasks[handle] = task
+        self._tool_task_holders[task] = self._tool_task_holders.get(task, 0) + 1
+        return handle
+    
+    def _drop_tool_task(self, future: asyncio.Future) -> None:
+        """Stop waiting for an in-flight call, cancelling it unless a fork still waits for it."""
+        future.cancel()
+        task = self._shared_tool_tasks.pop(future, None)
+        if task is None:
+            return
+        self._tool_task_holders[task] -= 1
+        if not self._tool_task_holders[task]:
+            del self._tool_task_holders[task]
+            task.cancel()
+    
+    def fork(self, name: Optional[str] = None) -> 'ConversationalAgent':
+        """Create a child agent that continues this conversation independently.
+        
+        Pending tool calls are carried over; calls already running are shared,
+        so both agents receive their results. Each agent awaits a shared call
+        through its own handle, and the call is cancelled only once every
+        agent holding it has cancelled its turn.
+        """
+        child = super().fork(name)
+        child._pending_tool_calls = dict(self._pending_tool_calls)
+        child._inflight_tool_calls = {}
+        child._shared_tool_tasks = {}
+        for call_id, future in list(self._inflight_tool_calls.items()):
+            task = self._shared_tool_tasks.get(future)
+            if task is None:
+                task = future
+                self._inflight_tool_calls[call_id] = self._hold_tool_task(task)
+            child._inflight_tool_calls[call_id] = child._hold_tool_task(task)
+        return child
+    
+    def _cancel_pending_work(self) -> None:
+        """Cancel speculatively started tool calls and drop queued ones."""
+        for future in self._inflight_tool_calls.values():
+            self._drop_tool_task(future)
+        self._inflight_tool_calls.clear()
+        self._pending_tool_calls.clear()
     
     async def _process_pending_tool_calls(self) -> List[Dict[str, Any]]:
         """Process any pending tool calls and return the results."""
         if not self._pending_tool_calls:
             return []
         
-        results = []
-        
-        for call_id, tool_call in list(self._pending_tool_calls.items()):
-            tool = self.tools.get(tool_call.tool_name)
-            if not tool:
-                logger.warning(f"Tool not found: {tool_call.tool_name}")
-                results.append({
-                    "call_id": call_id,
-                    "status": "error",
-                    "error": f"Tool not found: {tool_call.tool_name}"
-                })
-                continue
-            
-            try:
-                # Execute the tool asynchronously
-                result = await tool.execute(**tool_call.parameters)
-                results.append({
-                    "call_id": call_id,
-                    "status": "success",
-                    "result": result
-                })
-            except Exception as e:
-                logger.error(f"Error executing tool {tool_call.tool_name}: {e}", exc_info=True)
-                results.append({
-                    "call_id": call_id,
-                    "status": "error",
-                    "error": str(e)
-                })
-            
-            # Remove the processed tool call
-            self._pending_tool_calls.pop(call_id, None)
+        tool_calls = list(self._pending_tool_calls.values())
+        self.state = AgentState.EXECUTING
+        # Calls started speculatively are awaited, the rest are run now
+        started = {
+            call.id: self._inflight_tool_calls.pop(call.id)
+            for call in tool_calls if call.id in self._inflight_tool_calls
+        }
+        try:
+            plan = ToolPlan(tool_calls)
+            if plan.has_dependencies:
+                # Calls feeding into each other run as a DAG, each as soon as its inputs are ready
+                results = await plan.run(self._run_tool_call, started)
+            else:
+                remaining = [call for call in tool_calls if call.id not in started]
+                ran, *finished = await asyncio.gather(
+                    self.tool_executor.run(remaining, self.tools),
+                    *started.values()
+                )
+                by_id = dict(zip(started, finished))
+                by_id.update((result.call_id, result) for result in ran)
+                results = [by_id[call.id] for call in tool_calls]
+        finally:
+            self.state = AgentState.THINKING
+            # Finished calls are unaffected; ones abandoned by a cancelled turn
+            # are cancelled unless a fork still waits for them
+            for future in started.values():
+                self._drop_tool_task(future)
+            # Remove the processed tool calls
+            for tool_call in tool_calls:
+                self._pending_tool_calls.pop(tool_call.id, None)
         
-        return results
+        return [result.to_dict() for result in results]
     
     def _truncate_history(self) -> None:
-        """Truncate the conversation history if it exceeds max_history."""
-        if len(self.memory) > self.max_history:
-            # Keep the system prompt and the most recent messages
-            system_messages = [msg for msg in self.memory if msg.role == MessageRole.SYSTEM]
-            recent_messages = self.memory[-self.max_history + len(system_messages):]
-            self.memory = system_messages + recent_messages
+        """Truncate the conversation history if it exceeds max_history.
+        
+        Memory is kept within budget as messages are appended, so this only
+        matters after ``max_history`` has been changed.
+        """
+        self.memory.max_messages = self.max_history
+        self.memory.fit()
 
 # Example tool implementations
 class CalculatorTool(Tool):
-    """A simple calculator tool that can perform basic arithmetic."""
+    """A simple calculator tool that can perform basic arithmetic.
+    
+    Calls take microseconds and run in the event loop; the evaluator refuses
+    powers whose result would be too large to compute quickly.
+    """
+    
+    cacheable = True
+    coalesce = True
     
     @property
     def name(self) -> str:
@@ -196,33 +337,45 @@ class CalculatorTool(Tool):
                 "expression": {
                     "type": "string",
                     "description": "The arithmetic expression to evaluate"
+                },
+                "variables": {
+                    "type": "object",
+                    "description": "Values for variables used in the expression",
+                    "additionalProperties": {"type": "number"}
                 }
             },
             "required": ["expression"]
         }
     
-    async def execute(self, expression: str) -> float:
+    async def execute(self, expression: str, variables: Optional[Dict[str, float]] = None) -> float:
         """Evaluate an arithmetic expression."""
-        try:
-            # Use eval with a restricted scope for demonstration
-            # In production, use a safer evaluation method
-            allowed_operators = {
-                '__builtins__': {},
-                'sqrt': __import__('math').sqrt,
-                'sin': __import__('math').sin,
-                'cos': __import__('math').cos,
-                'tan': __import__('math').tan,
-                'pi': __import__('math').pi,
-                'e': __import__('math').e
-            }
-            result = eval(expression, {'__builtins__': {}}, allowed_operators)
-            return float(result)
-        except Exception as e:
-            raise ToolError(f"Error evaluating expression: {e}")
+        return self.run(expression, variables)
+    
+    def run(self, expression: str, variables: Optional[Dict[str, float]] = None) -> float:
+        """Evaluate an arithmetic expression synchronously."""
+        return calculator.evaluate(expression, variables)
+    
+    async def execute_many(
+        self,
+        expression: str,
+        bindings: Union[Dict[str, List[float]], List[Dict[str, float]]]
+    ) -> List[float]:
+        """Evaluate one expression over many variable bindings.
+        
+        Args:
+            expression: The arithmetic expression to evaluate
+            bindings: Variable names mapped to arrays of values, or a list of
+                per-row variable mappings
+        """
+        return calculator.evaluate_many(expression, bindings)
 
 class WebSearchTool(Tool):
     """A tool for performing web searches."""
     
+    cacheable = True
+    cache_ttl = 300.0
+    coalesce = True
+    
     @property
     def name(self) -> str:
         return "web_search"
@@ -265,6 +418,8 @@ class WebSearchTool(Tool):
 # Example usage
 if __name__ == "__main__":
     import asyncio
+
+    logging.basicConfig(level=logging.INFO)
     
     async def main():
         # Create an agent with some tools
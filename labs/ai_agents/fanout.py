@@ -0,0 +1,112 @@
+"""
+Fan-Out Implementation
+
+This module provides hedged requests across several agents. The same message
+is sent to every agent, concurrently or with staggered starts, and the first
+response that passes an acceptance check wins; the other agents are then
+cancelled through their cancellation tokens, which stops their generation and
+tool calls.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence
+
+from .base_agent import BaseAgent, AgentState, Message
+from .cancellation import CancellationToken, OperationCancelled
+
+logger = logging.getLogger(__name__)
+
+# Reason given to the agents that lost
+LOST_REASON = "another agent answered first"
+
+@dataclass
+class FanOutResult:
+    """Outcome of a fan-out.
+
+    Attributes:
+        index: Position of the winning agent, or None if no response was accepted
+        response: The accepted response
+        rejected: Responses that failed the acceptance check, by agent position
+        failed: Agents whose turn ended in an error, by position, with the error response
+    """
+    index: Optional[int] = None
+    response: Optional[Message] = None
+    rejected: Dict[int, Message] = field(default_factory=dict)
+    failed: Dict[int, Message] = field(default_factory=dict)
+
+    @property
+    def accepted(self) -> bool:
+        return self.index is not None
+
+async def fan_out(
+    agents: Sequence[BaseAgent],
+    message: Message,
+    accept: Optional[Callable[[Message], bool]] = None,
+    *,
+    timeout: Optional[float] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    hedge_delay: Optional[float] = None
+) -> FanOutResult:
+    """Send a message to several agents and return the first acceptable response.
+
+    Args:
+        agents: Agents to ask, for example with different system prompts or tools
+        message: The message to send to every agent
+        accept: Predicate a response must pass; any successful response passes by default
+        timeout: Seconds allowed for the whole fan-out
+        cancel_token: Token that stops every agent when it fires
+        hedge_delay: Start agent ``i`` only after ``i * hedge_delay`` seconds
+            without an accepted response, instead of starting all at once
+
+    Once a response is accepted, every other agent's token is cancelled and
+    the call waits for them to stop, which is immediate for agents waiting on
+    a backend or tool. Agents that lost keep the message in memory but not a
+    response, like any cancelled turn.
+    """
+    parent = CancellationToken(timeout, parent=cancel_token)
+    tokens = [CancellationToken(parent=parent) for _ in agents]
+    result = FanOutResult()
+
+    async def ask(index: int) -> Optional[Message]:
+        token = tokens[index]
+        if hedge_delay and index:
+            try:
+                await token.run(asyncio.sleep(hedge_delay * index))
+            except OperationCancelled:
+                return None
+        response = await agents[index].process_message(message, cancel_token=token)
+        return None if token.cancelled else response
+
+    tasks = {asyncio.ensure_future(ask(index)): index for index in range(len(agents))}
+    pending = set(tasks)
+    try:
+        while pending and not result.accepted:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Check in agent order so simultaneous answers are decided deterministically
+            for task in sorted(done, key=tasks.get):
+                index = tasks[task]
+                response = task.result()
+                if response is None:
+                    continue
+                if agents[index].state == AgentState.ERROR:
+                    result.failed[index] = response
+                elif result.accepted or (accept is not None and not accept(response)):
+                    result.rejected[index] = response
+                else:
+                    result.index = index
+                    result.response = response
+    finally:
+        for index, token in enumerate(tokens):
+            if index != result.index:
+                token.cancel(LOST_REASON if result.accepted else parent.reason)
+        if pending:
+            # Agents return promptly once their token fires; wait so nothing is left running
+            await asyncio.gather(*pending, return_exceptions=True)
+        for token in tokens:
+            token.close()
+        parent.close()
+
+    if not result.accepted:
+        logger.warning(f"No acceptable response from {len(agents)} agents")
+    return result
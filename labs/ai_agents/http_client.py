@@ -0,0 +1,247 @@
+"""
+Async HTTP Client Implementation
+
+This module provides a small HTTP/1.1 client built on asyncio streams, for
+``http`` and ``https`` URLs. It keeps idle connections alive in a per-host
+pool and bounds how many requests are in flight at once, so many agents can
+share one client.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import ssl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Pool key: scheme, host, port
+Origin = Tuple[str, str, int]
+
+class HTTPError(Exception):
+    """Raised when a request fails or the server returns an error status."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+@dataclass
+class HTTPResponse:
+    """A fully read HTTP response."""
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+class _Connection:
+    """A single keep-alive connection."""
+
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # The event loop that owns the connection is already closed
+            pass
+
+class AsyncHTTPClient:
+    """A pooled, keep-alive HTTP/1.1 client for JSON APIs.
+
+    Connections and the in-flight limit belong to the event loop that made
+    them, so when the client is used from a new loop, as after another
+    ``asyncio.run``, it starts a fresh pool for it.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 32,
+        max_idle_per_host: int = 16,
+        timeout: float = 60.0,
+        ssl_context: Optional['ssl.SSLContext'] = None
+    ):
+        """Initialize the client.
+
+        Args:
+            max_connections: Maximum number of requests in flight at once
+            max_idle_per_host: Maximum number of idle connections kept per host
+            timeout: Seconds to wait for connecting and for each read
+            ssl_context: TLS settings for https URLs (the system defaults,
+                with certificate verification, if None)
+        """
+        self.max_connections = max_connections
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Dict[Origin, List[_Connection]] = {}
+        self._closed = False
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        """Reset the pool if the running loop changed, and get its request limit."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections of another loop can't be used here; drop them
+            stale, self._idle = self._idle, {}
+            for connections in stale.values():
+                for connection in connections:
+                    connection.close()
+            self._limit = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+        return self._limit
+
+    async def _acquire(self, origin: Origin) -> Tuple[_Connection, bool]:
+        """Get an idle connection to an origin or open a new one.
+
+        Returns:
+            The connection and whether it was reused from the pool
+        """
+        idle = self._idle.get(origin)
+        while idle:
+            connection = idle.pop()
+            if not connection.reader.at_eof() and not connection.writer.is_closing():
+                return connection, True
+            connection.close()
+        scheme, host, port = origin
+        tls = (self.ssl_context or True) if scheme == "https" else None
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=tls), self.timeout)
+        return _Connection(reader, writer), False
+
+    def _release(self, origin: Origin, connection: _Connection, reusable: bool) -> None:
+        """Return a connection to the pool, or close it."""
+        idle = self._idle.setdefault(origin, [])
+        if reusable and not self._closed and len(idle) < self.max_idle_per_host:
+            idle.append(connection)
+        else:
+            connection.close()
+
+    async def _send(self, connection: _Connection, method: str, host: str, path: str,
+                    body: bytes, headers: Optional[Dict[str, str]]) -> None:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        connection.writer.write(head + body)
+        await connection.writer.drain()
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        status_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout)
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HTTPError(f"Malformed status line: {status_line!r}")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout)
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return int(parts[1]), headers
+
+    async def _iter_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        """Yield the response body as it arrives."""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout)
+                size = int(size_line.split(b";", 1)[0], 16)
+                if size == 0:
+                    # Skip trailers up to the final empty line
+                    while await asyncio.wait_for(reader.readuntil(b"\r\n"), self.timeout) != b"\r\n":
+                        pass
+                    return
+                data = await asyncio.wait_for(reader.readexactly(size + 2), self.timeout)
+                yield data[:-2]
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            if length:
+                yield await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        else:
+            # Body delimited by the server closing the connection
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), self.timeout)
+                if not data:
+                    return
+                yield data
+
+    async def stream(self, method: str, url: str, body: bytes = b"",
+                     headers: Optional[Dict[str, str]] = None) -> AsyncIterator[Tuple[int, Dict[str, str], bytes]]:
+        """Send a request and yield ``(status, headers, chunk)`` for each body chunk.
+
+        The first item always carries an empty chunk so callers can check the
+        status before reading the body.
+        """
+        if self._closed:
+            raise HTTPError("Client is closed")
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS:
+            raise HTTPError(f"Unsupported URL scheme {parts.scheme!r} in {url!r}")
+        host = parts.hostname or "localhost"
+        port = parts.port or DEFAULT_PORTS[scheme]
+        origin = (scheme, host, port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        async with self._bind_loop():
+            connection, reused = await self._acquire(origin)
+            reusable = False
+            try:
+                try:
+                    await self._send(connection, method, parts.netloc, path, body, headers)
+                    status, response_headers = await self._read_head(connection.reader)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    if not reused:
+                        raise
+                    # The server dropped an idle pooled connection; retry once on a fresh one
+                    logger.debug(f"Pooled connection to {host}:{port} was closed: {e}")
+                    connection.close()
+                    connection, reused = await self._acquire(origin)
+                    await self._send(connection, method, parts.netloc, path, body, headers)
+                    status, response_headers = await self._read_head(connection.reader)
+                yield status, response_headers, b""
+                async for chunk in self._iter_body(connection.reader, response_headers):
+                    yield status, response_headers, chunk
+                reusable = (
+                    response_headers.get("connection", "").lower() != "close"
+                    and ("content-length" in response_headers
+                         or response_headers.get("transfer-encoding", "").lower() == "chunked")
+                )
+            finally:
+                self._release(origin, connection, reusable)
+
+    async def request(self, method: str, url: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> HTTPResponse:
+        """Send a request and read the whole response."""
+        response = HTTPResponse(status=0)
+        chunks: List[bytes] = []
+        async for status, response_headers, chunk in self.stream(method, url, body, headers):
+            response.status = status
+            response.headers = response_headers
+            chunks.append(chunk)
+        response.body = b"".join(chunks)
+        return response
+
+    async def close(self) -> None:
+        """Close every pooled connection."""
+        self._closed = True
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+_shared_client: Optional[AsyncHTTPClient] = None
+
+def get_shared_client() -> AsyncHTTPClient:
+    """Get the process-wide client shared by HTTP backends that don't bring their own."""
+    global _shared_client
+    if _shared_client is None or _shared_client._closed:
+        _shared_client = AsyncHTTPClient()
+    return _shared_client
@@ -0,0 +1,271 @@
+"""
+Conversation Memory Implementation
+
+This module provides a bounded conversation window for agent memory. The
+window keeps a running token total that is updated as messages are added, so
+keeping it within budget costs O(1) amortized per message. Messages are kept
+in a persistent log that forks share structurally, so branching a
+conversation costs O(1) regardless of its length.
+"""
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .messages import Message, MessageRole
+
+def estimate_tokens(message: Message) -> int:
+    """Roughly estimate the token count of a message (about four characters per token)."""
+    return (len(message.content) + 3) // 4 + 1
+
+def count_characters(message: Message) -> int:
+    """Measure a message by its number of characters."""
+    return len(message.content)
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+class PersistentLog:
+    """An append-only sequence whose forks share structure.
+
+    Items are stored in a 32-way trie of immutable tuples plus a mutable tail
+    of up to 32 items, as in a persistent vector. Appending costs O(1)
+    amortized (a full tail is pushed into the trie by copying at most one
+    short path), indexing costs O(log32 n), and ``fork`` costs O(1): the fork
+    and the original share the trie and copy the tail only when they next
+    append.
+    """
+
+    __slots__ = ('_count', '_shift', '_root', '_tail', '_owns_tail')
+
+    def __init__(self, items: Optional[List[Any]] = None):
+        self._count = 0
+        self._shift = _BITS
+        self._root: Tuple[Any, ...] = ()
+        self._tail: List[Any] = []
+        self._owns_tail = True
+        for item in items or ():
+            self.append(item)
+
+    def _tail_offset(self) -> int:
+        return self._count - len(self._tail)
+
+    def _new_path(self, level: int, node: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        while level:
+            node = (node,)
+            level -= _BITS
+        return node
+
+    def _push_leaf(self, level: int, node: Tuple[Any, ...], leaf: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """Copy the path to the rightmost leaf position, adding ``leaf`` there."""
+        index = ((self._count - 1) >> level) & _MASK
+        if level == _BITS:
+            return node + (leaf,)
+        if index < len(node):
+            return node[:index] + (self._push_leaf(level - _BITS, node[index], leaf),)
+        return node + (self._new_path(level - _BITS, leaf),)
+
+    def append(self, item: Any) -> None:
+        """Add an item at the end."""
+        if len(self._tail) == _WIDTH:
+            leaf = tuple(self._tail)
+            if (self._count >> _BITS) > (1 << self._shift):
+                # The trie is full; grow a level
+                self._root = (self._root, self._new_path(self._shift, leaf))
+                self._shift += _BITS
+            else:
+                self._root = self._push_leaf(self._shift, self._root, leaf)
+            self._tail = []
+            self._owns_tail = True
+        elif not self._owns_tail:
+            self._tail = self._tail[:self._count - self._tail_offset()]
+            self._owns_tail = True
+        self._tail.append(item)
+        self._count += 1
+
+    def fork(self) -> 'PersistentLog':
+        """Get an independent log with the same items, sharing their storage."""
+        child = PersistentLog.__new__(PersistentLog)
+        child._count = self._count
+        child._shift = self._shift
+        child._root = self._root
+        child._tail = self._tail
+        child._owns_tail = self._owns_tail = False
+        return child
+
+    def _leaf(self, index: int) -> Tuple[Any, ...]:
+        node = self._root
+        level = self._shift
+        while level:
+            node = node[(index >> level) & _MASK]
+            level -= _BITS
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("log index out of range")
+        tail_offset = self._tail_offset()
+        if index >= tail_offset:
+            return self._tail[index - tail_offset]
+        return self._leaf(index)[index & _MASK]
+
+    def iter_from(self, start: int = 0) -> Iterator[Any]:
+        """Iterate over the items from position ``start`` on."""
+        tail_offset = self._tail_offset()
+        position = max(0, start)
+        while position < tail_offset:
+            leaf = self._leaf(position)
+            yield from leaf[position & _MASK:]
+            position = (position | _MASK) + 1
+        yield from self._tail[position - tail_offset:self._count - tail_offset]
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter_from(0)
+
+    def __len__(self) -> int:
+        return self._count
+
+class ConversationWindow:
+    """A list-like message window that stays within a token and message budget.
+
+    System messages are pinned: they are never evicted and are always yielded
+    first. Other messages are evicted oldest-first once the budget is exceeded,
+    but the most recent message is always kept. ``fork`` creates an
+    independent window sharing this one's messages in O(1).
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        token_counter: Callable[[Message], int] = estimate_tokens
+    ):
+        """Initialize the window.
+
+        Args:
+            max_tokens: Budget for the whole window as measured by ``token_counter``
+            max_messages: Maximum number of messages, including pinned ones
+            token_counter: Function returning the cost of a message
+        """
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.token_counter = token_counter
+        self._pinned: Tuple[Message, ...] = ()
+        self._pinned_tokens = 0
+        # (message, cost) entries; those before _start have been evicted
+        self._log = PersistentLog()
+        self._start = 0
+        self._tokens = 0
+        # Entries released from the front of _log when it was rebuilt
+        self._released = 0
+
+    @property
+    def appended(self) -> int:
+        """Number of unpinned messages added since creation or ``clear``, evicted ones included."""
+        return self._released + len(self._log)
+
+    @property
+    def total_tokens(self) -> int:
+        """Total cost of all messages in the window."""
+        return self._pinned_tokens + self._tokens
+
+    @property
+    def pinned(self) -> Tuple[Message, ...]:
+        """The pinned system messages."""
+        return self._pinned
+
+    def replace_pinned(self, messages: Iterable[Message]) -> None:
+        """Replace the pinned messages, for example with interned equivalents."""
+        self._pinned = messages if isinstance(messages, tuple) else tuple(messages)
+        self._pinned_tokens = sum(map(self.token_counter, self._pinned))
+        self.fit()
+
+    def append(self, message: Message) -> None:
+        """Add a message, evicting the oldest unpinned messages if over budget."""
+        cost = self.token_counter(message)
+        if message.role == MessageRole.SYSTEM:
+            self._pinned += (message,)
+            self._pinned_tokens += cost
+        else:
+            self._log.append((message, cost))
+            self._tokens += cost
+        self.fit()
+
+    def extend(self, messages: List[Message]) -> None:
+        """Add several messages in order."""
+        for message in messages:
+            self.append(message)
+
+    def fit(self) -> int:
+        """Evict the oldest unpinned messages until the window is within budget.
+
+        Returns:
+            The number of evicted messages
+        """
+        evicted = 0
+        while len(self._log) - self._start > 1 and self._over_budget():
+            self._tokens -= self._log[self._start][1]
+            self._start += 1
+            evicted += 1
+        if self._start > _WIDTH and self._start > len(self._log) - self._start:
+            # Rebuild once more has been evicted than is kept, releasing the
+            # evicted entries (forks keep their own references) at O(1) amortized
+            self._log = PersistentLog(list(self._log.iter_from(self._start)))
+            self._released += self._start
+            self._start = 0
+        return evicted
+
+    def _over_budget(self) -> bool:
+        """Whether the window currently exceeds either limit."""
+        if self.max_messages is not None and len(self) > self.max_messages:
+            return True
+        return self.max_tokens is not None and self._pinned_tokens + self._tokens > self.max_tokens
+
+    def clear(self) -> None:
+        """Remove every message, including pinned ones."""
+        self._pinned = ()
+        self._pinned_tokens = 0
+        self._log = PersistentLog()
+        self._start = 0
+        self._tokens = 0
+        self._released = 0
+
+    def fork(self) -> 'ConversationWindow':
+        """Get an independent copy of the window in O(1).
+
+        The copy shares the stored messages; appends and evictions on either
+        window don't affect the other.
+        """
+        child = ConversationWindow(self.max_tokens, self.max_messages, self.token_counter)
+        child._pinned = self._pinned
+        child._pinned_tokens = self._pinned_tokens
+        child._log = self._log.fork()
+        child._start = self._start
+        child._tokens = self._tokens
+        child._released = self._released
+        return child
+
+    def __len__(self) -> int:
+        return len(self._pinned) + len(self._log) - self._start
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[Message]:
+        yield from self._pinned
+        for message, _ in self._log.iter_from(self._start):
+            yield message
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Message, List[Message]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("conversation window index out of range")
+        if index < len(self._pinned):
+            return self._pinned[index]
+        return self._log[self._start + index - len(self._pinned)][0]
+
+    def __repr__(self) -> str:
+        return f"ConversationWindow(messages={len(self)}, tokens={self.total_tokens})"
@@ -0,0 +1,73 @@
+"""
+Message Implementation
+
+This module provides the message types exchanged between users, agents and tools.
+"""
+from typing import Dict, Any, Iterable, Optional
+from dataclasses import dataclass, field
+from enum import Enum
+import json
+
+class MessageRole(Enum):
+    """Roles for message senders in the conversation."""
+    SYSTEM = "system"
+    USER = "user"
+    ASSISTANT = "assistant"
+    TOOL = "tool"
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    """A message in the conversation.
+    
+    Messages are immutable, so their wire forms are computed at most once and
+    reused every time the history is serialized.
+    """
+    role: MessageRole
+    content: str
+    name: Optional[str] = None
+    tool_call_id: Optional[str] = None
+    _wire_dict: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _wire_json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert message to dictionary format.
+        
+        The dictionary is cached on the message and shared between callers,
+        so treat it as read-only.
+        """
+        result = self._wire_dict
+        if result is None:
+            result = {
+                "role": self.role.value,
+                "content": self.content
+            }
+            if self.name:
+                result["name"] = self.name
+            if self.tool_call_id:
+                result["tool_call_id"] = self.tool_call_id
+            object.__setattr__(self, "_wire_dict", result)
+        return result
+    
+    def to_json(self) -> bytes:
+        """Serialize the message to compact UTF-8 JSON, caching the result."""
+        result = self._wire_json
+        if result is None:
+            result = json.dumps(
+                self.to_dict(), ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            object.__setattr__(self, "_wire_json", result)
+        return result
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Message':
+        """Create a message from a dictionary."""
+        return cls(
+            role=MessageRole(data["role"]),
+            content=data["content"],
+            name=data.get("name"),
+            tool_call_id=data.get("tool_call_id")
+        )
+
+def join_json_messages(messages: Iterable[Message]) -> bytes:
+    """Stitch the cached JSON of several messages into a JSON array."""
+    return b"[" + b",".join([message.to_json() for message in messages]) + b"]"
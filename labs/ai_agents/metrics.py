@@ -0,0 +1,169 @@
+"""
+Agent Metrics Implementation
+
+This module provides low-overhead histograms and counters for instrumenting
+agents, with a snapshot API for in-process use and a Prometheus text export.
+"""
+from bisect import bisect_left
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+# Labels are stored as a sorted tuple of (name, value) pairs so they can key a dict
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+COUNT_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+BYTE_BUCKETS: Tuple[float, ...] = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216
+)
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+class Histogram:
+    """A fixed-bucket histogram of observed values."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Get ``(upper_bound, cumulative_count)`` pairs, ending with infinity."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    """A collection of named, labelled histograms and counters."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._histogram_help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._counter_help: Dict[str, str] = {}
+
+    def histogram(self, name: str, labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = LATENCY_BUCKETS, help: str = "") -> Histogram:
+        """Get or create a histogram.
+
+        Hot paths should keep the returned histogram and call ``observe`` on it
+        directly instead of looking it up each time.
+        """
+        series = self._histograms.setdefault(name, {})
+        if help:
+            self._histogram_help.setdefault(name, help)
+        key = _labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        return histogram
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None,
+                buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Record a value in a histogram."""
+        self.histogram(name, labels, buckets).observe(value)
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1, help: str = "") -> None:
+        """Increment a counter."""
+        series = self._counters.setdefault(name, {})
+        if help:
+            self._counter_help.setdefault(name, help)
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def counter_value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        """Get the current value of a counter."""
+        return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a plain-data copy of every metric."""
+        return {
+            "histograms": {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": [
+                            ["+Inf" if bound == float("inf") else bound, total]
+                            for bound, total in histogram.cumulative()
+                        ]
+                    }
+                    for labels, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            },
+            "counters": {
+                name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                for name, series in self._counters.items()
+            }
+        }
+
+    def to_prometheus(self) -> str:
+        """Export every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for name, series in sorted(self._histograms.items()):
+            if name in self._histogram_help:
+                lines.append(f"# HELP {name} {self._histogram_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                for bound, total in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else _format_number(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {total}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for name, series in sorted(self._counters.items()):
+            if name in self._counter_help:
+                lines.append(f"# HELP {name} {self._counter_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zero every metric, keeping histograms that callers hold on to valid."""
+        for series in self._histograms.values():
+            for histogram in series.values():
+                histogram.counts = [0] * len(histogram.counts)
+                histogram.sum = 0.0
+                histogram.count = 0
+        for series in self._counters.values():
+            for key in series:
+                series[key] = 0
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{key}="{_escape(str(value))}"' for key, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# Registry used by agents that aren't given one
+default_registry = MetricsRegistry()
@@ -0,0 +1,87 @@
+"""
+Prompt Prefix Registry Implementation
+
+This module provides interning of the leading messages that many sessions
+share, such as a course's system prompt. Each distinct prefix is stored once,
+together with its serialized bytes and a stable hash that backends can send
+to servers that cache prompts by prefix.
+"""
+import hashlib
+import weakref
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .messages import Message
+
+# Identifies a message by content, the same way Message equality does
+MessageKey = Tuple[str, str, Optional[str], Optional[str]]
+
+def _message_key(message: Message) -> MessageKey:
+    return (message.role.value, message.content, message.name, message.tool_call_id)
+
+class Prefix:
+    """An interned sequence of leading messages.
+
+    Attributes:
+        messages: The canonical message objects shared by every session using the prefix
+        json: The messages' JSON objects joined with commas, ready to be spliced
+            into a JSON array
+        hash: Hex SHA-256 of ``json``, stable across processes
+    """
+
+    __slots__ = ('messages', 'json', 'hash', '__weakref__')
+
+    def __init__(self, messages: Tuple[Message, ...]):
+        self.messages = messages
+        self.json = b",".join([message.to_json() for message in messages])
+        self.hash = hashlib.sha256(self.json).hexdigest()
+
+    def join_json(self, messages: Iterable[Message]) -> bytes:
+        """Serialize the prefix followed by ``messages`` as a JSON array."""
+        parts = [message.to_json() for message in messages]
+        if self.json:
+            parts.insert(0, self.json)
+        return b"[" + b",".join(parts) + b"]"
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __repr__(self) -> str:
+        return f"Prefix(messages={len(self.messages)}, hash={self.hash[:12]})"
+
+class PrefixRegistry:
+    """Interns message prefixes so identical ones are stored once.
+
+    Prefixes are held weakly: one stays registered as long as some agent (or
+    other caller) keeps a reference to it, and is dropped after that.
+    """
+
+    def __init__(self):
+        self._by_content: "weakref.WeakValueDictionary[Tuple[MessageKey, ...], Prefix]" = weakref.WeakValueDictionary()
+        # Fast path for messages that are already canonical; a prefix keeps its
+        # messages alive, so their ids can't be reused while the entry exists
+        self._by_identity: "weakref.WeakValueDictionary[Tuple[int, ...], Prefix]" = weakref.WeakValueDictionary()
+
+    def intern(self, messages: Iterable[Message]) -> Prefix:
+        """Get the registered prefix equal to ``messages``, registering it if needed."""
+        messages = tuple(messages)
+        identity = tuple(map(id, messages))
+        prefix = self._by_identity.get(identity)
+        if prefix is not None:
+            return prefix
+        key = tuple(map(_message_key, messages))
+        prefix = self._by_content.get(key)
+        if prefix is None:
+            prefix = Prefix(messages)
+            self._by_content[key] = prefix
+            self._by_identity[identity] = prefix
+        return prefix
+
+    def lookup(self, messages: Sequence[Message]) -> Optional[Prefix]:
+        """Get the registered prefix made of exactly these message objects, if any."""
+        return self._by_identity.get(tuple(map(id, messages)))
+
+    def __len__(self) -> int:
+        return len(self._by_content)
+
+# Registry used by agents that aren't given one
+default_prefix_registry = PrefixRegistry()
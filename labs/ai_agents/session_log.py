@@ -0,0 +1,315 @@
+"""
+Session Log Implementation
+
+This module provides durable, binary per-session conversation logs. Messages
+are appended to a log file as length-prefixed, checksummed records and
+periodically compacted into a snapshot with an offset index. Resuming a
+session memory-maps the snapshot, decodes only the messages it needs and
+replays the short log tail, with no JSON involved.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from .messages import Message, MessageRole
+from .agent_manager import SessionStore
+
+logger = logging.getLogger(__name__)
+
+_ROLES = list(MessageRole)
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+_SYSTEM_CODE = _ROLE_CODES[MessageRole.SYSTEM]
+
+# Record: crc32 of everything after it, role, name length, tool call ID length,
+# content length, then the UTF-8 name, tool call ID and content
+_RECORD = struct.Struct("<IBHHI")
+# Log header: magic, generation
+_LOG_MAGIC = b"AGLOG001"
+_LOG_HEADER = struct.Struct("<8sQ")
+# Snapshot header: magic, generation, record count, offset of the record index
+_SNAPSHOT_MAGIC = b"AGSNAP01"
+_SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+
+def encode_message(message: Message) -> bytes:
+    """Encode a message as a log record."""
+    name = (message.name or "").encode("utf-8")
+    call_id = (message.tool_call_id or "").encode("utf-8")
+    content = message.content.encode("utf-8")
+    body = _RECORD.pack(0, _ROLE_CODES[message.role], len(name), len(call_id), len(content))[4:]
+    body += name + call_id + content
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+def _record_size(buffer: Sequence[int], offset: int) -> int:
+    _, _, name_len, call_len, content_len = _RECORD.unpack_from(buffer, offset)
+    return _RECORD.size + name_len + call_len + content_len
+
+def decode_message(buffer: Sequence[int], offset: int) -> Message:
+    """Decode the log record at ``offset`` of a buffer."""
+    _, role, name_len, call_len, content_len = _RECORD.unpack_from(buffer, offset)
+    start = offset + _RECORD.size
+    name = bytes(buffer[start:start + name_len]).decode("utf-8")
+    start += name_len
+    call_id = bytes(buffer[start:start + call_len]).decode("utf-8")
+    start += call_len
+    content = bytes(buffer[start:start + content_len]).decode("utf-8")
+    return Message(role=_ROLES[role], content=content, name=name or None, tool_call_id=call_id or None)
+
+def _scan_records(buffer: Sequence[int], start: int) -> Iterator[Tuple[int, int]]:
+    """Yield ``(offset, size)`` of each intact record, stopping at a torn or corrupt one."""
+    offset = start
+    end = len(buffer)
+    while offset + _RECORD.size <= end:
+        size = _record_size(buffer, offset)
+        if offset + size > end:
+            break
+        (crc,) = struct.unpack_from("<I", buffer, offset)
+        if zlib.crc32(buffer[offset + 4:offset + size]) != crc:
+            break
+        yield offset, size
+        offset += size
+
+class SessionLog:
+    """Append-only binary conversation logs, one log and snapshot per session.
+
+    ``append`` writes records to ``<session>.log``. Once a log holds
+    ``compact_every`` records, and at least a quarter as many as the snapshot
+    so rewriting it stays amortized O(1) per record, it is folded into
+    ``<session>.snap``, which stores every record followed by an index of
+    their offsets. Each compaction bumps a generation number stored in both
+    files, so a crash between writing the snapshot and resetting the log
+    never replays records twice, and a torn record at the end of a log is
+    ignored.
+    """
+
+    def __init__(self, directory: str, compact_every: int = 1000, fsync: bool = False):
+        """Initialize the log.
+
+        Args:
+            directory: Directory holding the files (created if needed)
+            compact_every: Log records that trigger compaction into the snapshot
+            fsync: Flush writes to disk before returning
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        # Record counts of each session's log and snapshot, once known
+        self._log_records: Dict[str, int] = {}
+        self._snapshot_records: Dict[str, int] = {}
+
+    def _path(self, session_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, quote(session_id, safe="") + suffix)
+
+    def _write_file(self, path: str, data: bytes) -> None:
+        """Replace a file atomically."""
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    def _read_snapshot(self, session_id: str) -> Tuple[int, Optional[mmap.mmap], List[int]]:
+        """Map a session's snapshot, returning its generation, the map and the record offsets."""
+        try:
+            f = open(self._path(session_id, ".snap"), "rb")
+        except FileNotFoundError:
+            return 0, None, []
+        with f:
+            if os.fstat(f.fileno()).st_size < _SNAPSHOT_HEADER.size:
+                return 0, None, []
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, generation, count, index_offset = _SNAPSHOT_HEADER.unpack_from(snapshot, 0)
+        if magic != _SNAPSHOT_MAGIC:
+            snapshot.close()
+            raise ValueError(f"Not a session snapshot: {self._path(session_id, '.snap')}")
+        offsets = list(struct.unpack_from(f"<{count}Q", snapshot, index_offset))
+        return generation, snapshot, offsets
+
+    def _read_log(self, session_id: str, generation: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+        """Read a session's log, returning its contents and the records newer than the snapshot."""
+        try:
+            with open(self._path(session_id, ".log"), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return b"", []
+        if len(data) < _LOG_HEADER.size:
+            return data, []
+        magic, log_generation = _LOG_HEADER.unpack_from(data, 0)
+        if magic != _LOG_MAGIC or log_generation < generation:
+            # Already folded into the snapshot by a compaction that didn't finish resetting the log
+            return data, []
+        return data, list(_scan_records(data, _LOG_HEADER.size))
+
+    def append(self, session_id: str, messages: Sequence[Message]) -> None:
+        """Append messages to a session's log, compacting it if it has grown long enough."""
+        if not messages:
+            return
+        path = self._path(session_id, ".log")
+        count = self._log_records.get(session_id)
+        if count is None:
+            generation, self._snapshot_records[session_id] = self._read_snapshot_header(session_id)
+            data, records = self._read_log(session_id, generation)
+            end = records[-1][0] + records[-1][1] if records else _LOG_HEADER.size
+            if not records or len(data) != end:
+                # Start a fresh log, or cut off a torn record left by a crash
+                header = _LOG_HEADER.pack(_LOG_MAGIC, generation)
+                self._write_file(path, header + b"".join(data[o:o + s] for o, s in records))
+            count = len(records)
+        with open(path, "ab") as f:
+            f.write(b"".join(map(encode_message, messages)))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        count += len(messages)
+        self._log_records[session_id] = count
+        if count >= max(self.compact_every, self._snapshot_records.get(session_id, 0) // 4):
+            self.compact(session_id)
+
+    def _read_snapshot_header(self, session_id: str) -> Tuple[int, int]:
+        """Get the generation and record count of a session's snapshot."""
+        try:
+            with open(self._path(session_id, ".snap"), "rb") as f:
+                header = f.read(_SNAPSHOT_HEADER.size)
+        except FileNotFoundError:
+            return 0, 0
+        if len(header) < _SNAPSHOT_HEADER.size:
+            return 0, 0
+        return _SNAPSHOT_HEADER.unpack(header)[1:3]
+
+    def compact(self, session_id: str) -> None:
+        """Fold a session's log into its snapshot and reset the log."""
+        generation, snapshot, offsets = self._read_snapshot(session_id)
+        try:
+            data, records = self._read_log(session_id, generation)
+            parts: List[bytes] = []
+            new_offsets: List[int] = []
+            position = _SNAPSHOT_HEADER.size
+            # Records are copied as raw bytes; nothing is decoded
+            for offset in offsets:
+                size = _record_size(snapshot, offset)
+                parts.append(snapshot[offset:offset + size])
+                new_offsets.append(position)
+                position += size
+            for offset, size in records:
+                parts.append(data[offset:offset + size])
+                new_offsets.append(position)
+                position += size
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+        header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, generation + 1, len(new_offsets), position)
+        index = struct.pack(f"<{len(new_offsets)}Q", *new_offsets)
+        self._write_file(self._path(session_id, ".snap"), header + b"".join(parts) + index)
+        self._write_file(self._path(session_id, ".log"), _LOG_HEADER.pack(_LOG_MAGIC, generation + 1))
+        self._log_records[session_id] = 0
+        self._snapshot_records[session_id] = len(new_offsets)
+
+    def load(self, session_id: str, limit: Optional[int] = None) -> Optional[List[Message]]:
+        """Load a session's messages, or None if it has no log.
+
+        Args:
+            session_id: Session to load
+            limit: Keep only the system messages and the last ``limit`` other
+                messages; the others are skipped without being decoded
+        """
+        generation, snapshot, offsets = self._read_snapshot(session_id)
+        try:
+            data, records = self._read_log(session_id, generation)
+            if snapshot is None and not data:
+                return None
+            self._log_records[session_id] = len(records)
+            self._snapshot_records[session_id] = len(offsets)
+            # (buffer, offset) of every record, oldest first
+            located = [(snapshot, offset) for offset in offsets] + [(data, offset) for offset, _ in records]
+            if limit is not None:
+                # The role byte follows the checksum, so roles can be read without decoding
+                others = [i for i, (buffer, offset) in enumerate(located) if buffer[offset + 4] != _SYSTEM_CODE]
+                skipped = set(others[:max(0, len(others) - limit)])
+                located = [item for i, item in enumerate(located) if i not in skipped]
+            return [decode_message(buffer, offset) for buffer, offset in located]
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+
+    def delete(self, session_id: str) -> None:
+        """Remove a session's files."""
+        for suffix in (".log", ".snap"):
+            try:
+                os.remove(self._path(session_id, suffix))
+            except FileNotFoundError:
+                pass
+        self._log_records.pop(session_id, None)
+        self._snapshot_records.pop(session_id, None)
+
+class SessionLogStore(SessionStore):
+    """Session store that keeps each session in a SessionLog.
+
+    For every session it counts the system and other messages already in the
+    log, as of the last load or save, and appends only messages beyond those
+    counts, so nothing is written twice; pinned system messages in particular
+    are written once. It is ``incremental``, so the manager saves after every
+    turn and no message leaves the window unsaved. Sessions must be loaded
+    before they are saved. File access runs in a worker thread.
+    """
+
+    incremental = True
+
+    def __init__(self, directory: str, compact_every: int = 1000, fsync: bool = False):
+        self.log = SessionLog(directory, compact_every, fsync)
+        # (system messages, other messages appended to the window) in each session's log
+        self._saved: Dict[str, Tuple[int, int]] = {}
+
+    def _unsaved(self, session_id: str, messages: List[Message], appended: Optional[int]) -> List[Message]:
+        pinned = 0
+        while pinned < len(messages) and messages[pinned].role == MessageRole.SYSTEM:
+            pinned += 1
+        window = messages[pinned:]
+        if appended is None:
+            appended = len(window)
+        saved_pinned, saved_appended = self._saved.get(session_id, (0, 0))
+        new = appended - saved_appended
+        if new < 0:
+            # The window was cleared since the last save; everything in it is new
+            new = appended
+        if new > len(window):
+            logger.warning(
+                f"{new - len(window)} messages of session {session_id} left the window before being saved"
+            )
+            new = len(window)
+        self._saved[session_id] = (max(saved_pinned, pinned), appended)
+        return list(messages[saved_pinned:pinned]) + window[len(window) - new:]
+
+    async def save_messages(
+        self,
+        session_id: str,
+        messages: List[Message],
+        appended: Optional[int] = None
+    ) -> None:
+        unsaved = self._unsaved(session_id, messages, appended)
+        if unsaved:
+            await asyncio.to_thread(self.log.append, session_id, unsaved)
+
+    async def load_messages(self, session_id: str, limit: Optional[int] = None) -> Optional[List[Message]]:
+        messages = await asyncio.to_thread(self.log.load, session_id, limit)
+        pinned = sum(message.role == MessageRole.SYSTEM for message in messages or ())
+        # The agent is filled with exactly these messages, so its window counts start here
+        self._saved[session_id] = (pinned, len(messages or ()) - pinned)
+        return messages
+
+    async def save(self, session_id: str, history: List[Dict[str, Any]]) -> None:
+        await self.save_messages(session_id, [Message.from_dict(data) for data in history])
+
+    async def load(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        messages = await self.load_messages(session_id)
+        return None if messages is None else [message.to_dict() for message in messages]
+
+    async def delete(self, session_id: str) -> None:
+        self._saved.pop(session_id, None)
+        await asyncio.to_thread(self.log.delete, session_id)
@@ -0,0 +1,87 @@
+"""
+Single-flight Implementation
+
+This module provides call coalescing for tools: while a call is in flight,
+identical calls wait for it and share its outcome instead of executing again.
+"""
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task and receive the same result or
+    exception. Nothing is remembered once the call finishes. A caller that is
+    cancelled stops waiting without cancelling the call for the others; the
+    call itself is cancelled once every caller has given up on it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.executions = 0
+        self.coalesced: Counter = Counter()
+
+    def __len__(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a call with this key is in flight."""
+        return key in self._calls
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        group: str = "",
+        on_join: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """Run ``func`` unless a call with the same key is already in flight.
+
+        Args:
+            key: Identity of the call
+            func: Coroutine function performing the call
+            group: Label the coalesced count is recorded under, such as a tool name
+            on_join: Called when this caller joins a call already in flight
+
+        Returns:
+            The result of the call, whichever caller started it
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced[group] += 1
+            if on_join is not None:
+                on_join()
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+
+_shared_single_flight: Optional[SingleFlight] = None
+
+def get_shared_single_flight() -> SingleFlight:
+    """Get the single-flight group shared by every agent in the process."""
+    global _shared_single_flight
+    if _shared_single_flight is None:
+        _shared_single_flight = SingleFlight()
+    return _shared_single_flight
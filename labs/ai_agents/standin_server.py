@@ -0,0 +1,188 @@
+"""
+Stand-in Generation Server
+
+This module provides a local HTTP server that imitates a text generation API
+with configurable latency and token rate, so agents and HTTP backends can be
+exercised and benchmarked offline.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+from typing import Dict, Any, Callable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+def echo_reply(messages: List[Dict[str, Any]]) -> str:
+    """Reply by echoing the last user message."""
+    if messages and messages[-1].get("role") == "user":
+        return f"You said: {messages[-1].get('content', '')}"
+    return "I'm not sure how to respond to that."
+
+class StandInServer:
+    """A local stand-in for an LLM generation server.
+
+    Serves ``POST /v1/generate`` and ``POST /v1/generate_batch`` as described
+    in ``HTTPBackend``. Each request waits ``latency`` seconds before the first
+    token and then produces tokens at ``tokens_per_second``. A batch is
+    processed like one request whose length is that of its longest reply, as
+    batched inference would be. Connections are kept alive between requests.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        tokens_per_second: Optional[float] = 100.0,
+        reply: Callable[[List[Dict[str, Any]]], str] = echo_reply,
+        failure_rate: float = 0.0
+    ):
+        """Initialize the server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Seconds before the first token of each response
+            tokens_per_second: Token generation rate (None for instant)
+            reply: Function producing the reply text from the request messages
+            failure_rate: Fraction of requests answered with 503, to exercise retries
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.failure_rate = failure_rate
+        self.requests_served = 0
+        self.batches_served = 0
+        self.connections_opened = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        """Start listening."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop listening and close every open connection."""
+        if self._server is not None:
+            self._server.close()
+            for handler in list(self._handlers):
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> 'StandInServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _token_delay(self) -> None:
+        if self.tokens_per_second:
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        self.connections_opened += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._respond(writer, method, path, body)
+                self.requests_served += 1
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug(f"Stand-in server connection ended: {e}")
+        except asyncio.CancelledError:
+            pass  # the server is shutting down
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+        reason = {200: "OK", 404: "Not Found", 400: "Bad Request", 503: "Service Unavailable"}.get(status, "")
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+        )
+
+    async def _respond(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes) -> None:
+        if method != "POST" or path not in ("/v1/generate", "/v1/generate_batch"):
+            self._write_response(writer, 404, {"error": "not found"})
+            return await writer.drain()
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._write_response(writer, 400, {"error": "invalid JSON"})
+            return await writer.drain()
+
+        await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self._write_response(writer, 503, {"error": "overloaded"})
+            return await writer.drain()
+
+        if path == "/v1/generate_batch":
+            replies = [_TOKEN_PATTERN.findall(self.reply(item.get("messages", [])))
+                       for item in request.get("requests", [])]
+            for _ in range(max(map(len, replies), default=0)):
+                await self._token_delay()
+            self.batches_served += 1
+            self._write_response(writer, 200, {"results": [{"content": "".join(t)} for t in replies]})
+            return await writer.drain()
+
+        tokens = _TOKEN_PATTERN.findall(self.reply(request.get("messages", [])))
+        if not request.get("stream"):
+            for _ in tokens:
+                await self._token_delay()
+            self._write_response(writer, 200, {"content": "".join(tokens)})
+            return await writer.drain()
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        for token in tokens:
+            await self._token_delay()
+            data = json.dumps({"delta": token}).encode("utf-8") + b"\n"
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    async def main():
+        port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+        server = StandInServer(port=port)
+        await server.start()
+        print(f"Stand-in generation server listening on {server.url}")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Tool Result Cache Implementation
+
+This module provides an LRU cache with per-tool TTLs for the results of tools
+that declare themselves cacheable.
+"""
+import json
+import time
+from collections import OrderedDict, Counter
+from typing import Dict, Any, Optional, Tuple
+
+_MISSING = object()
+
+def make_cache_key(tool_name: str, parameters: Dict[str, Any]) -> Optional[str]:
+    """Build a cache key from a tool name and canonicalized JSON parameters.
+
+    Returns:
+        The key, or None if the parameters can't be represented as JSON
+    """
+    try:
+        canonical = json.dumps(parameters, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return f"{tool_name}:{canonical}"
+
+class ToolResultCache:
+    """A size-bounded LRU cache of tool results with per-tool TTLs.
+
+    Cached results are shared between callers, so treat them as read-only.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        default_ttl: Optional[float] = None,
+        tool_ttls: Optional[Dict[str, float]] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached results
+            default_ttl: Seconds a result stays valid (None for no expiry)
+            tool_ttls: TTL overrides keyed by tool name
+        """
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.tool_ttls = dict(tool_ttls or {})
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.evictions = 0
+
+    def ttl_for(self, tool_name: str, tool_ttl: Optional[float] = None) -> Optional[float]:
+        """Get the TTL for a tool, preferring configured overrides over the tool's own."""
+        if tool_name in self.tool_ttls:
+            return self.tool_ttls[tool_name]
+        return tool_ttl if tool_ttl is not None else self.default_ttl
+
+    def get(self, tool_name: str, key: str, default: Any = None) -> Any:
+        """Look up a cached result, counting the hit or miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits[tool_name] += 1
+                return value
+            del self._entries[key]
+        self.misses[tool_name] += 1
+        return default
+
+    def lookup(self, tool_name: str, key: str) -> Tuple[bool, Any]:
+        """Look up a cached result.
+
+        Returns:
+            A ``(found, value)`` tuple, so that cached None results are distinguishable
+        """
+        value = self.get(tool_name, key, _MISSING)
+        if value is _MISSING:
+            return False, None
+        return True, value
+
+    def put(self, tool_name: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a result, evicting the least recently used entries if full."""
+        ttl = self.ttl_for(tool_name, ttl)
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tool_name: Optional[str] = None) -> None:
+        """Drop cached results for one tool, or all results if no tool is given."""
+        if tool_name is None:
+            self._entries.clear()
+            return
+        prefix = f"{tool_name}:"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit, miss and eviction counters."""
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            "size": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": self.evictions,
+            "per_tool": {
+                name: {"hits": self.hits[name], "misses": self.misses[name]}
+                for name in set(self.hits) | set(self.misses)
+            }
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
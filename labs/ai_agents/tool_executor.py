@@ -0,0 +1,224 @@
+"""
+Tool Executor Implementation
+
+This module provides the executor that agents use to run queued tool calls,
+either one after another or concurrently with bounded parallelism.
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+from .base_agent import Tool, ToolCall, ToolResult
+from .tool_cache import ToolResultCache, make_cache_key
+from .metrics import MetricsRegistry, Histogram, default_registry
+from .single_flight import SingleFlight
+from .cancellation import current_token, bind_token, unbind_token
+
+if TYPE_CHECKING:
+    from .worker_pools import WorkerPools
+
+logger = logging.getLogger(__name__)
+
+class ToolExecutor:
+    """Runs tool calls with agent-wide and per-tool concurrency limits.
+
+    Results are always returned in the order the calls were given. Every call
+    is isolated: a timeout or exception in one call is reported as an error
+    result for that call and never cancels or delays the others. Tools with a
+    thread or process ``execution_mode`` run in worker pools, shared between
+    executors unless ``pools`` is given. With a ``single_flight`` group,
+    identical concurrent calls of a tool instance that sets ``coalesce`` run
+    once. The shared execution is bound by the tool's own timeout only; each
+    caller's cancellation deadline limits just its own wait.
+    """
+
+    def __init__(
+        self,
+        concurrent: bool = True,
+        max_concurrency: Optional[int] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+        default_timeout: Optional[float] = None,
+        cache: Optional[ToolResultCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        pools: Optional['WorkerPools'] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        """Initialize the executor.
+
+        Args:
+            concurrent: Run calls concurrently; if False, run them in order
+            max_concurrency: Maximum number of calls running at once (None for no limit)
+            tool_concurrency: Per-tool limits keyed by tool name, overriding
+                ``Tool.max_concurrency``
+            default_timeout: Timeout in seconds for tools that don't set ``Tool.timeout``
+            cache: Result cache consulted for tools that set ``Tool.cacheable``
+            metrics: Registry receiving per-tool latency and error metrics
+            pools: Worker pools for thread and process tools (the shared pools by default)
+            single_flight: Group coalescing identical in-flight calls, which may be
+                shared between executors (None to run every call)
+        """
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+        self.tool_concurrency = dict(tool_concurrency or {})
+        self.default_timeout = default_timeout
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else default_registry
+        self.pools = pools
+        self.single_flight = single_flight
+        self._latency_histograms: Dict[str, Histogram] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _tool_semaphore(self, tool: Tool) -> Optional[asyncio.Semaphore]:
+        """Get the semaphore limiting concurrent calls of a tool, if any."""
+        limit = self.tool_concurrency.get(tool.name, tool.max_concurrency)
+        if not limit:
+            return None
+        semaphore = self._tool_semaphores.get(tool.name)
+        if semaphore is None:
+            semaphore = self._tool_semaphores[tool.name] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _latency_histogram(self, tool_name: str) -> Histogram:
+        histogram = self._latency_histograms.get(tool_name)
+        if histogram is None:
+            histogram = self._latency_histograms[tool_name] = self.metrics.histogram(
+                "tool_execution_seconds", {"tool": tool_name},
+                help="Time to execute a tool call, excluding time waiting for a slot"
+            )
+        return histogram
+
+    def _record_error(self, tool_name: str, reason: str) -> None:
+        self.metrics.inc("tool_errors_total", {"tool": tool_name, "reason": reason},
+                         help="Failed tool calls by reason")
+
+    def _timeout_for(self, tool: Tool) -> Optional[float]:
+        """Get the per-call timeout for a tool, capped by the current token's deadline."""
+        timeout = tool.timeout if tool.timeout is not None else self.default_timeout
+        token = current_token()
+        remaining = token.remaining() if token is not None else None
+        if remaining is not None and (timeout is None or remaining < timeout):
+            return remaining
+        return timeout
+
+    async def _invoke(self, tool: Tool, tool_call: ToolCall) -> Any:
+        """Execute the tool, applying its timeout and recording its latency."""
+        timeout = self._timeout_for(tool)
+        started = time.perf_counter()
+        try:
+            if tool.execution_mode != "async":
+                if self.pools is not None:
+                    pools = self.pools
+                else:
+                    # Imported here so agents without blocking tools never load the pool machinery
+                    from .worker_pools import get_shared_pools
+                    pools = get_shared_pools()
+                return await pools.run(tool, tool_call.parameters, timeout)
+            if timeout is None:
+                return await tool.execute(**tool_call.parameters)
+            return await asyncio.wait_for(tool.execute(**tool_call.parameters), timeout)
+        finally:
+            self._latency_histogram(tool.name).observe(time.perf_counter() - started)
+
+    async def _acquire_and_invoke(self, tool: Tool, tool_call: ToolCall) -> Any:
+        """Execute the tool once both concurrency limits allow it."""
+        tool_semaphore = self._tool_semaphore(tool)
+        if self._semaphore is None and tool_semaphore is None:
+            return await self._invoke(tool, tool_call)
+        # Take the per-tool slot first so a saturated tool doesn't hold agent-wide slots
+        if tool_semaphore is not None:
+            await tool_semaphore.acquire()
+        try:
+            if self._semaphore is None:
+                return await self._invoke(tool, tool_call)
+            async with self._semaphore:
+                return await self._invoke(tool, tool_call)
+        finally:
+            if tool_semaphore is not None:
+                tool_semaphore.release()
+
+    async def _invoke_shared(self, tool: Tool, tool_call: ToolCall) -> Any:
+        """Execute a call on behalf of every caller coalesced onto it.
+
+        It runs as its own task, which would inherit the first caller's
+        cancellation token; unbinding it keeps that caller's deadline from
+        applying to the others.
+        """
+        reset = bind_token(None)
+        try:
+            return await self._acquire_and_invoke(tool, tool_call)
+        finally:
+            unbind_token(reset)
+
+    async def run_one(self, tool: Optional[Tool], tool_call: ToolCall) -> ToolResult:
+        """Execute a single tool call and wrap the outcome in a ToolResult."""
+        if tool is None:
+            self._record_error(tool_call.tool_name, "not_found")
+            logger.warning(f"Tool not found: {tool_call.tool_name}")
+            return ToolResult(
+                call_id=tool_call.id,
+                status="error",
+                error=f"Tool not found: {tool_call.tool_name}"
+            )
+
+        use_cache = self.cache is not None and tool.cacheable
+        coalesce = self.single_flight is not None and tool.coalesce
+        call_key = make_cache_key(tool.name, tool_call.parameters) if use_cache or coalesce else None
+        if use_cache and call_key is not None:
+            found, result = self.cache.lookup(tool.name, call_key)
+            if found:
+                return ToolResult(call_id=tool_call.id, status="success", result=result)
+
+        timeout = self._timeout_for(tool)
+        try:
+            if coalesce and call_key is not None:
+                # Every agent builds its own tool instances, so calls are merged
+                # across agents by tool class and name rather than by object
+                tool_type = type(tool)
+                flight_key = f"{tool_type.__module__}.{tool_type.__qualname__}:{call_key}"
+                waiting = self.single_flight.do(
+                    flight_key, lambda: self._invoke_shared(tool, tool_call), tool.name,
+                    on_join=lambda: self.metrics.inc(
+                        "tool_coalesced_total", {"tool": tool.name},
+                        help="Tool calls that joined an identical call in flight"
+                    )
+                )
+                token = current_token()
+                remaining = token.remaining() if token is not None else None
+                result = await (waiting if remaining is None else asyncio.wait_for(waiting, remaining))
+            else:
+                result = await self._acquire_and_invoke(tool, tool_call)
+            if use_cache and call_key is not None:
+                self.cache.put(tool.name, call_key, result, tool.cache_ttl)
+            return ToolResult(call_id=tool_call.id, status="success", result=result)
+        except asyncio.TimeoutError:
+            self._record_error(tool.name, "timeout")
+            error = f"Tool {tool_call.tool_name} timed out"
+            if timeout is not None:
+                error += f" after {timeout:.3g}s"
+            logger.warning(error)
+            return ToolResult(call_id=tool_call.id, status="error", error=error)
+        except Exception as e:
+            self._record_error(tool.name, "error")
+            logger.error(f"Error executing tool {tool_call.tool_name}: {e}", exc_info=True)
+            return ToolResult(call_id=tool_call.id, status="error", error=str(e))
+
+    async def run(self, tool_calls: List[ToolCall], tools: Dict[str, Tool]) -> List[ToolResult]:
+        """Execute tool calls and return their results in call order.
+
+        Args:
+            tool_calls: The calls to execute
+            tools: Available tools keyed by name
+        """
+        if not self.concurrent or len(tool_calls) <= 1:
+            return [
+                await self.run_one(tools.get(call.tool_name), call)
+                for call in tool_calls
+            ]
+
+        # run_one never raises for tool failures, so gather only fails on cancellation
+        return list(await asyncio.gather(*(
+            self.run_one(tools.get(call.tool_name), call)
+            for call in tool_calls
+        )))
@@ -0,0 +1,180 @@
+"""
+Tool Call Parser Implementation
+
+This module provides an incremental parser that extracts tool calls of the
+form ``TOOL: name {json}`` from generated text as it streams in. Each call is
+reported as soon as its JSON arguments are complete, and the text around the
+calls is passed through unchanged.
+"""
+import json
+import logging
+import uuid
+from typing import Dict, Any, List, Union
+
+logger = logging.getLogger(__name__)
+
+# Prefix marking a tool call in generated text
+TOOL_CALL_PREFIX = "TOOL:"
+
+ParseEvent = Union[str, Dict[str, Any]]
+
+_TEXT, _NAME, _ARGS = range(3)
+
+def _is_name_char(char: str) -> bool:
+    return char.isalnum() or char in "_-."
+
+class ToolCallParser:
+    """Incrementally parses tool calls out of streamed text.
+
+    ``feed`` and ``close`` return a list of events in input order: strings for
+    plain text and dictionaries with ``name``, ``parameters`` and ``id`` keys
+    for completed tool calls. Malformed calls are passed through as text.
+    Every character is scanned once, so parsing is linear in the input size.
+    """
+
+    def __init__(self, prefix: str = TOOL_CALL_PREFIX):
+        self.prefix = prefix
+        self._buffer = ""
+        self._state = _TEXT
+        self._pos = 0
+        self._name = ""
+        self._args_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[ParseEvent]:
+        """Parse another chunk of text and return the events it completes."""
+        self._buffer += chunk
+        events: List[ParseEvent] = []
+        while self._step(events):
+            pass
+        return events
+
+    def close(self) -> List[ParseEvent]:
+        """Finish parsing, returning any held-back text including an unfinished call."""
+        events: List[ParseEvent] = []
+        if self._state != _TEXT:
+            logger.warning(f"Incomplete tool call at end of response: {self._buffer[:50]!r}")
+        if self._buffer:
+            events.append(self._buffer)
+        self._reset("")
+        return events
+
+    def _reset(self, remainder: str) -> None:
+        """Return to the text state with the given unparsed input."""
+        self._buffer = remainder
+        self._state = _TEXT
+        self._pos = 0
+
+    def _step(self, events: List[ParseEvent]) -> bool:
+        """Advance the state machine; returns False when more input is needed."""
+        if self._state == _TEXT:
+            return self._scan_text(events)
+        if self._state == _NAME:
+            return self._scan_name(events)
+        return self._scan_args(events)
+
+    def _scan_text(self, events: List[ParseEvent]) -> bool:
+        index = self._buffer.find(self.prefix, self._pos)
+        if index < 0:
+            # Hold back a trailing partial prefix, emit everything before it
+            keep = 0
+            for size in range(min(len(self.prefix) - 1, len(self._buffer)), 0, -1):
+                if self.prefix.startswith(self._buffer[-size:]):
+                    keep = size
+                    break
+            cut = len(self._buffer) - keep
+            if cut > 0:
+                events.append(self._buffer[:cut])
+                self._buffer = self._buffer[cut:]
+            self._pos = 0
+            return False
+        if index > 0:
+            events.append(self._buffer[:index])
+        self._buffer = self._buffer[index:]
+        self._state = _NAME
+        self._pos = len(self.prefix)
+        self._name = ""
+        return True
+
+    def _scan_name(self, events: List[ParseEvent]) -> bool:
+        buffer = self._buffer
+        pos = self._pos
+        # Skip whitespace after the prefix, then read the name
+        if not self._name:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            start = pos
+            while pos < len(buffer) and _is_name_char(buffer[pos]):
+                pos += 1
+            if pos == len(buffer):
+                return False  # the name may continue in the next chunk
+            if pos == start:
+                return self._reject(events, pos)
+            self._name = buffer[start:pos]
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        self._pos = pos
+        if pos == len(buffer):
+            return False
+        if buffer[pos] != "{":
+            return self._reject(events, pos)
+        self._state = _ARGS
+        self._args_start = pos
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        return True
+
+    def _scan_args(self, events: List[ParseEvent]) -> bool:
+        buffer = self._buffer
+        pos = self._pos
+        depth, in_string, escaped = self._depth, self._in_string, self._escaped
+        while pos < len(buffer):
+            char = buffer[pos]
+            pos += 1
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return self._finish_call(events, pos)
+        self._pos, self._depth, self._in_string, self._escaped = pos, depth, in_string, escaped
+        return False
+
+    def _finish_call(self, events: List[ParseEvent], end: int) -> bool:
+        raw = self._buffer[self._args_start:end]
+        try:
+            parameters = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse tool call: {e}")
+            return self._reject(events, end)
+        events.append({
+            "name": self._name,
+            "parameters": parameters,
+            "id": f"call_{uuid.uuid4().hex}"
+        })
+        self._reset(self._buffer[end:])
+        return True
+
+    def _reject(self, events: List[ParseEvent], end: int) -> bool:
+        """Pass a malformed call through as text and continue after it."""
+        events.append(self._buffer[:end])
+        self._reset(self._buffer[end:])
+        return True
+
+def parse_tool_calls(text: str) -> List[Dict[str, Any]]:
+    """Extract every tool call from a complete piece of text."""
+    parser = ToolCallParser()
+    events = parser.feed(text) + parser.close()
+    return [event for event in events if isinstance(event, dict)]
@@ -0,0 +1,158 @@
+"""
+Tool Plan Implementation
+
+This module provides dependency-aware execution of tool calls. A parameter
+value of the form ``{"$ref": <call>, "path": "a.0.b"}`` stands for the result
+of another call in the same plan (optionally a part of it), so a model can
+chain calls in one response. Calls form a DAG that is executed with each call
+starting as soon as the calls it depends on have finished.
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Awaitable, Callable, List, Mapping, Optional, Set
+
+from .base_agent import ToolCall, ToolResult, ToolError
+
+logger = logging.getLogger(__name__)
+
+REF_KEY = "$ref"
+PATH_KEY = "path"
+
+def _is_ref(value: Any) -> bool:
+    if not (isinstance(value, dict) and REF_KEY in value and set(value) <= {REF_KEY, PATH_KEY}):
+        return False
+    # Calls are referenced by id or position; anything else is an ordinary value
+    target = value[REF_KEY]
+    return isinstance(target, (str, int)) and not isinstance(target, bool)
+
+def find_refs(value: Any) -> Set[Any]:
+    """Get every call referenced anywhere in a parameter value."""
+    refs: Set[Any] = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if _is_ref(item):
+            refs.add(item[REF_KEY])
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return refs
+
+def rewrite_refs(value: Any, mapping: Callable[[Any], Any]) -> Any:
+    """Copy a parameter value, replacing each reference target with ``mapping(target)``."""
+    if _is_ref(value):
+        return {**value, REF_KEY: mapping(value[REF_KEY])}
+    if isinstance(value, dict):
+        return {key: rewrite_refs(item, mapping) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rewrite_refs(item, mapping) for item in value]
+    return value
+
+def _follow_path(value: Any, path: str) -> Any:
+    for part in filter(None, str(path).split(".")):
+        try:
+            value = value[int(part)] if isinstance(value, (list, tuple)) else value[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ToolError(f"Path {path!r} not found in referenced result")
+    return value
+
+def resolve_refs(value: Any, results: Mapping[str, Any]) -> Any:
+    """Copy a parameter value, replacing each reference with the referenced result."""
+    if _is_ref(value):
+        result = results[value[REF_KEY]]
+        return _follow_path(result, value[PATH_KEY]) if PATH_KEY in value else result
+    if isinstance(value, dict):
+        return {key: resolve_refs(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(item, results) for item in value]
+    return value
+
+async def run_after(
+    tool_call: ToolCall,
+    dependencies: Mapping[str, "asyncio.Future[ToolResult]"],
+    run_call: Callable[[ToolCall], Awaitable[ToolResult]]
+) -> ToolResult:
+    """Run a call once its dependencies finished, with their results substituted.
+
+    If a dependency failed, the call is skipped with an error result, so a
+    failure only affects the calls downstream of it.
+    """
+    if dependencies:
+        finished = await asyncio.gather(*dependencies.values())
+        failed = [result.call_id for result in finished if result.status != "success"]
+        if failed:
+            return ToolResult(
+                call_id=tool_call.id,
+                status="error",
+                error=f"Skipped because call {failed[0]} failed"
+            )
+        try:
+            parameters = resolve_refs(tool_call.parameters, {r.call_id: r.result for r in finished})
+        except ToolError as e:
+            return ToolResult(call_id=tool_call.id, status="error", error=str(e))
+        tool_call = ToolCall(id=tool_call.id, tool_name=tool_call.tool_name, parameters=parameters)
+    return await run_call(tool_call)
+
+class ToolPlan:
+    """A set of tool calls whose parameters may reference each other's results."""
+
+    def __init__(self, tool_calls: List[ToolCall]):
+        self.tool_calls = list(tool_calls)
+        self.dependencies: Dict[str, Set[Any]] = {
+            call.id: find_refs(call.parameters) for call in self.tool_calls
+        }
+
+    @property
+    def has_dependencies(self) -> bool:
+        """Whether any call references another call."""
+        return any(self.dependencies.values())
+
+    async def run(
+        self,
+        run_call: Callable[[ToolCall], Awaitable[ToolResult]],
+        started: Optional[Mapping[str, "asyncio.Future[ToolResult]"]] = None
+    ) -> List[ToolResult]:
+        """Execute the plan and return the results in call order.
+
+        Args:
+            run_call: Coroutine function executing a single call
+            started: Running calls, keyed by ID, that calls in the plan may reference
+
+        Calls referencing unknown calls, or taking part in a cycle, fail
+        without running, as does everything downstream of them.
+        """
+        futures: Dict[str, asyncio.Future] = dict(started or {})
+        by_id = {call.id: call for call in self.tool_calls}
+        results: Dict[str, ToolResult] = {}
+        pending = [call for call in self.tool_calls if call.id not in futures]
+        # Create tasks in dependency order so every dependency already has a future
+        while pending:
+            ready = [
+                call for call in pending
+                if all(ref in futures or ref in results for ref in self.dependencies[call.id])
+            ]
+            if not ready:
+                for call in pending:
+                    missing = [ref for ref in self.dependencies[call.id] if ref not in by_id]
+                    reason = f"unknown call {missing[0]!r}" if missing else "a dependency cycle"
+                    results[call.id] = ToolResult(
+                        call_id=call.id, status="error", error=f"Can't run: references {reason}"
+                    )
+                    logger.warning(f"Tool call {call.id} can't run: references {reason}")
+                break
+            for call in ready:
+                failed = [ref for ref in self.dependencies[call.id] if ref in results]
+                if failed:
+                    results[call.id] = ToolResult(
+                        call_id=call.id, status="error", error=f"Skipped because call {failed[0]} failed"
+                    )
+                    continue
+                dependencies = {ref: futures[ref] for ref in self.dependencies[call.id]}
+                futures[call.id] = asyncio.ensure_future(run_after(call, dependencies, run_call))
+            pending = [call for call in pending if call.id not in futures and call.id not in results]
+
+        own = [call.id for call in self.tool_calls if call.id in futures]
+        finished = await asyncio.gather(*(futures[call_id] for call_id in own))
+        results.update(zip(own, finished))
+        return [results[call.id] for call in self.tool_calls]
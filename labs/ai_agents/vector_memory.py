@@ -0,0 +1,244 @@
+"""
+Vector Memory Implementation
+
+This module provides a long-term retrieval memory for agents. Messages are
+embedded as they arrive and stored as rows of a contiguous NumPy matrix, so
+the messages most relevant to a query can be found with a single vectorized
+cosine similarity search instead of sending the whole history to the model.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+from .memory import PersistentLog
+from .messages import Message, MessageRole
+
+# An embedding function maps a text to a fixed-length vector
+Embedder = Callable[[str], Sequence[float]]
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+@lru_cache(maxsize=65536)
+def _hash_token(token: str, dim: int) -> Tuple[int, float]:
+    """Map a token to a (bucket, sign) pair."""
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "little") % dim, 1.0 if digest[4] & 1 else -1.0
+
+class HashingEmbedder:
+    """A deterministic local embedder using the hashing trick.
+
+    Each word (and, optionally, each pair of adjacent words) is hashed into one
+    of ``dim`` buckets with a random sign. Texts that share words get similar
+    vectors, which is enough for keyword-level recall and makes results
+    reproducible in tests without a model.
+    """
+
+    def __init__(self, dim: int = 256, bigrams: bool = True):
+        """Initialize the embedder.
+
+        Args:
+            dim: Length of the produced vectors
+            bigrams: Also hash pairs of adjacent words
+        """
+        if np is None:
+            raise ImportError("HashingEmbedder requires NumPy")
+        self.dim = dim
+        self.bigrams = bigrams
+
+    def __call__(self, text: str) -> Any:
+        words = _WORD_PATTERN.findall(text.lower())
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])] if self.bigrams else words
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if tokens:
+            buckets, signs = zip(*(_hash_token(token, self.dim) for token in tokens))
+            np.add.at(vector, np.fromiter(buckets, dtype=np.intp), np.fromiter(signs, dtype=np.float32))
+        return vector
+
+class VectorMemory:
+    """An append-only store of message embeddings with top-k cosine recall.
+
+    Embeddings are normalized when added and kept in one contiguous float32
+    matrix that doubles in capacity when full, so adding a message is O(1)
+    amortized and a search is a single matrix-vector product over all of them.
+    ``fork`` freezes the rows stored so far into a read-only block, with the
+    index of their messages, shared by both memories; messages are kept in a
+    ``PersistentLog``. Each memory then appends to a small matrix and index of
+    its own, so forking and the appends after it cost O(1) and copy nothing
+    shared. A search takes one product per block; a new block is merged with
+    the one before it while that one is no larger, which keeps the number of
+    blocks logarithmic in the number of rows.
+    """
+
+    # Rows allocated for the first message added after a fork
+    FORK_CAPACITY = 8
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        initial_capacity: int = 256,
+        roles: Iterable[MessageRole] = (MessageRole.USER, MessageRole.ASSISTANT),
+        min_score: float = 0.0
+    ):
+        """Initialize the memory.
+
+        Args:
+            embedder: Embedding function (a ``HashingEmbedder`` by default)
+            initial_capacity: Number of rows allocated up front
+            roles: Roles of the messages that are stored; others are ignored
+            min_score: Lowest cosine similarity a recalled message may have
+        """
+        if np is None:
+            raise ImportError("VectorMemory requires NumPy")
+        self.embedder = embedder if embedder is not None else HashingEmbedder()
+        self.roles = frozenset(roles)
+        self.min_score = min_score
+        self._initial_capacity = max(1, initial_capacity)
+        # Read-only row blocks shared with forks, with the row of each of
+        # their messages by identity, then this memory's own rows
+        self._blocks: List[Any] = []
+        self._block_rows: List[Dict[int, int]] = []
+        self._frozen = 0
+        self._matrix: Optional[Any] = None
+        self._rows: Dict[int, int] = {}
+        self._messages = PersistentLog()
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Length of the stored vectors, known once the first message is added."""
+        if self._matrix is not None:
+            return self._matrix.shape[1]
+        return self._blocks[0].shape[1] if self._blocks else None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the embeddings, counting blocks shared with forks."""
+        own = 0 if self._matrix is None else self._matrix.nbytes
+        return own + sum(block.nbytes for block in self._blocks)
+
+    def _embed(self, text: str) -> Any:
+        """Embed a text as a normalized float32 vector."""
+        vector = np.asarray(self.embedder(text), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _row(self, message: Message) -> Optional[int]:
+        """Get the row of a stored message, or None if it isn't stored."""
+        key = id(message)
+        row = self._rows.get(key)
+        if row is None:
+            for rows in self._block_rows:
+                row = rows.get(key)
+                if row is not None:
+                    break
+        return row
+
+    def add(self, message: Message) -> bool:
+        """Embed and store a message.
+
+        Returns:
+            Whether the message was stored (messages with other roles, empty
+            content or already stored are skipped)
+        """
+        if message.role not in self.roles or not message.content or self._row(message) is not None:
+            return False
+        vector = self._embed(message.content)
+        dim = self.dim
+        if dim is not None and vector.shape[0] != dim:
+            raise ValueError(f"Embedding has length {vector.shape[0]}, expected {dim}")
+        size = len(self._messages)
+        row = size - self._frozen
+        if self._matrix is None:
+            capacity = min(self._initial_capacity, self.FORK_CAPACITY) if self._frozen else self._initial_capacity
+            self._matrix = np.zeros((capacity, vector.shape[0]), dtype=np.float32)
+        elif row == self._matrix.shape[0]:
+            grown = np.zeros((row * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:row] = self._matrix
+            self._matrix = grown
+        self._matrix[row] = vector
+        self._messages.append(message)
+        self._rows[id(message)] = size
+        return True
+
+    def fork(self) -> 'VectorMemory':
+        """Get an independent memory with the same messages, sharing their storage."""
+        rows = len(self._messages) - self._frozen
+        if rows:
+            # Both memories read these rows and neither writes them again
+            self._blocks = self._blocks + [self._matrix[:rows]]
+            self._block_rows = self._block_rows + [self._rows]
+            self._frozen += rows
+        self._matrix = None
+        self._rows = {}
+        while len(self._blocks) > 1 and len(self._blocks[-2]) <= len(self._blocks[-1]):
+            self._blocks = self._blocks[:-2] + [np.concatenate(self._blocks[-2:])]
+            self._block_rows = self._block_rows[:-2] + [{**self._block_rows[-2], **self._block_rows[-1]}]
+        child = VectorMemory.__new__(VectorMemory)
+        child.__dict__.update(self.__dict__)
+        child._rows = {}
+        child._messages = self._messages.fork()
+        return child
+
+    def extend(self, messages: Iterable[Message]) -> int:
+        """Store several messages and return how many were stored."""
+        return sum(self.add(message) for message in messages)
+
+    def search(self, text: str, k: int = 5, exclude: Iterable[Message] = ()) -> List[Tuple[Message, float]]:
+        """Find the stored messages most similar to a text.
+
+        Args:
+            text: Query text
+            k: Maximum number of messages to return
+            exclude: Messages to leave out, such as those already in the prompt
+
+        Returns:
+            ``(message, score)`` pairs, most similar first
+        """
+        size = len(self._messages)
+        if not size or k <= 0 or not text:
+            return []
+        query = self._embed(text)
+        blocks = self._blocks
+        if size > self._frozen:
+            blocks = blocks + [self._matrix[:size - self._frozen]]
+        if len(blocks) == 1:
+            scores = blocks[0] @ query
+        else:
+            scores = np.concatenate([block @ query for block in blocks])
+        excluded = [row for row in map(self._row, exclude) if row is not None]
+        if excluded:
+            scores[excluded] = -np.inf
+        if k < size:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [
+            (self._messages[row], float(scores[row]))
+            for row in top.tolist() if scores[row] > self.min_score
+        ]
+
+    def recall(self, text: str, k: int = 5, exclude: Iterable[Message] = ()) -> List[Message]:
+        """Get the top-k messages for a text in the order they were added."""
+        rows = sorted(self._row(message) for message, _ in self.search(text, k, exclude))
+        return [self._messages[row] for row in rows]
+
+    def clear(self) -> None:
+        """Remove every stored message, releasing the matrix."""
+        self._blocks = []
+        self._block_rows = []
+        self._frozen = 0
+        self._matrix = None
+        self._rows = {}
+        self._messages = PersistentLog()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __repr__(self) -> str:
+        return f"VectorMemory(messages={len(self._messages)}, dim={self.dim})"
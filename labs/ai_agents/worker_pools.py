@@ -0,0 +1,229 @@
+"""
+Tool Worker Pool Implementation
+
+This module provides the shared thread and process pools that run tools
+outside the event loop: blocking I/O tools in threads and CPU-bound tools in
+worker processes, where a runaway call can be killed without stalling the
+other sessions in the process.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import pickle
+from functools import partial
+from multiprocessing.connection import Connection
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .base_agent import Tool, ToolError
+
+logger = logging.getLogger(__name__)
+
+def _call_tool(tool: Tool, parameters: Dict[str, Any]) -> Any:
+    """Run a tool synchronously; executed inside a worker."""
+    return tool.run(**parameters)
+
+def _worker_main(conn: Connection) -> None:
+    """Serve tool calls sent over a pipe until told to stop; runs in a worker process."""
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        tool, parameters = request
+        try:
+            reply: Tuple[bool, Any] = (True, _call_tool(tool, parameters))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # The result or error couldn't be pickled; report that instead
+            conn.send((False, ToolError(f"Result of tool {tool.name} can't be sent back from a worker process: {e}")))
+
+class _Worker:
+    """A worker process and the pipe its calls go through."""
+
+    def __init__(self, context: multiprocessing.context.BaseContext):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        # Only the worker keeps the other end, so its death shows up as EOFError here
+        child_conn.close()
+        self.calls = 0
+
+    def call(self, tool: Tool, parameters: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Send a call and block until the worker replies."""
+        self.conn.send((tool, parameters))
+        return self.conn.recv()
+
+    def stop(self) -> None:
+        """Ask an idle worker to exit."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def kill(self) -> None:
+        """Terminate the worker, whatever it is doing."""
+        self.process.terminate()
+        self.conn.close()
+
+class WorkerPools:
+    """Thread and process pools for tools with a non-async ``execution_mode``.
+
+    Process workers are started with ``spawn``, run one call at a time and are
+    replaced after ``max_tasks_per_child`` calls so leaked memory doesn't
+    accumulate. Calls are only handed to a worker when one is free, so a
+    call's timeout covers its own execution and not time queued behind
+    others. A process call that times out or is cancelled while running gets
+    its own worker terminated; calls running in other workers are unaffected.
+    Thread calls can't be killed, so a timeout only stops waiting for them.
+    """
+
+    def __init__(
+        self,
+        max_processes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = 100
+    ):
+        """Initialize the pools; workers are only started when first needed.
+
+        Args:
+            max_processes: Number of worker processes (the CPU count by default)
+            max_threads: Number of worker threads (the executor default if not given)
+            max_tasks_per_child: Calls a worker process runs before it is replaced
+                (None to keep workers for the life of the pool)
+        """
+        self.max_processes = max_processes
+        self.max_threads = max_threads
+        self.max_tasks_per_child = max_tasks_per_child
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._busy: Set[_Worker] = set()
+        self._closed = False
+        self._thread_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # Created per event loop, since the shared pools outlive any one loop
+        self._process_slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _threads(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_threads, thread_name_prefix="tool"
+            )
+        return self._thread_pool
+
+    def _slots(self) -> asyncio.Semaphore:
+        """Get the limit on running process calls for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._process_slots = asyncio.Semaphore(self.max_processes or os.cpu_count() or 1)
+            self._slots_loop = loop
+        return self._process_slots
+
+    def _checkout(self) -> _Worker:
+        """Take an idle worker, starting one if there is none."""
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.process.is_alive():
+                break
+            worker.conn.close()
+        else:
+            worker = _Worker(self._context)
+        self._busy.add(worker)
+        return worker
+
+    def _checkin(self, worker: _Worker) -> None:
+        """Return a worker that finished its call, retiring it if it has run enough calls."""
+        self._busy.discard(worker)
+        worker.calls += 1
+        if self._closed or (self.max_tasks_per_child is not None and worker.calls >= self.max_tasks_per_child):
+            worker.stop()
+        else:
+            self._idle.append(worker)
+
+    def _kill(self, worker: _Worker) -> None:
+        """Terminate a worker whose call is still running."""
+        self._busy.discard(worker)
+        self.restarts += 1
+        worker.kill()
+
+    async def run(self, tool: Tool, parameters: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Run a tool in the pool matching its ``execution_mode``.
+
+        Raises:
+            asyncio.TimeoutError: If the call took longer than ``timeout`` seconds
+            ToolError: If the call couldn't be run in a worker
+        """
+        if tool.execution_mode == "thread":
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._threads(), partial(_call_tool, tool, parameters))
+            return await asyncio.wait_for(future, timeout)
+        if tool.execution_mode == "process":
+            return await self._run_in_process(tool, parameters, timeout)
+        raise ToolError(f"Unknown execution mode for tool {tool.name}: {tool.execution_mode}")
+
+    async def _run_in_process(self, tool: Tool, parameters: Dict[str, Any], timeout: Optional[float]) -> Any:
+        # Check up front so an unpicklable argument is reported as such instead
+        # of failing halfway through the send
+        try:
+            pickle.dumps((tool, parameters))
+        except Exception as e:
+            raise ToolError(f"Arguments for tool {tool.name} can't be sent to a worker process: {e}") from e
+
+        async with self._slots():
+            worker = self._checkout()
+            loop = asyncio.get_running_loop()
+            # The blocking send and receive happen in a thread; killing the
+            # worker ends the receive with EOFError
+            future = loop.run_in_executor(None, worker.call, tool, parameters)
+            try:
+                ok, value = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {tool.name} timed out in a worker process; terminating the worker")
+                self._kill(worker)
+                raise
+            except asyncio.CancelledError:
+                # Work that already started can only be stopped with its worker
+                logger.warning(f"Tool {tool.name} was cancelled in a worker process; terminating the worker")
+                self._kill(worker)
+                raise
+            except (EOFError, OSError) as e:
+                self._kill(worker)
+                raise ToolError(f"Worker process for tool {tool.name} died") from e
+            self._checkin(worker)
+        if not ok:
+            raise value
+        return value
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop both pools.
+
+        Idle worker processes exit at once; busy ones exit when their call
+        finishes.
+        """
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+        if wait:
+            for worker in idle:
+                worker.process.join()
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+
+_shared_pools: Optional[WorkerPools] = None
+
+def get_shared_pools() -> WorkerPools:
+    """Get the worker pools shared by every tool executor in the process."""
+    global _shared_pools
+    if _shared_pools is None:
+        _shared_pools = WorkerPools()
+    return _shared_pools
@@ -0,0 +1,228 @@
+"""
+Agent Throughput Benchmark
+
+This script drives N concurrent ConversationalAgent sessions through M turns
+each against a simulated backend and reports turn latency percentiles,
+throughput and peak memory. Results can be saved as JSON to compare runs.
+
+Usage:
+    python labs/benchmarks/agent_throughput.py --sessions 200 --turns 10 \\
+        --latency 0.05 --tool-mix calculator=0.2,web_search=0.1 --output results.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_agents.base_agent import Message, MessageRole
+from ai_agents.backends import LLMBackend, HTTPBackend
+from ai_agents.batching import BatchingBackend
+from ai_agents.conversational_agent import ConversationalAgent, CalculatorTool, WebSearchTool
+from ai_agents.metrics import MetricsRegistry
+from ai_agents.standin_server import StandInServer
+from ai_agents.tool_cache import ToolResultCache
+
+# Tool calls the simulated model emits, by tool name
+TOOL_CALLS = {
+    "calculator": lambda rng: 'TOOL: calculator {"expression": "%d * %d + sqrt(%d)"}' % (
+        rng.randint(1, 99), rng.randint(1, 99), rng.randint(1, 999)),
+    "web_search": lambda rng: 'TOOL: web_search {"query": "topic %d", "max_results": 3}' % rng.randint(1, 50),
+}
+
+class SimulatedBackend(LLMBackend):
+    """An in-process backend with fixed latency that sometimes asks for tools."""
+
+    def __init__(self, latency: float, tool_mix: Dict[str, float], seed: int = 0):
+        self.latency = latency
+        self.tool_mix = tool_mix
+        self.rng = random.Random(seed)
+
+    async def generate(self, messages: Sequence[Message], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        await asyncio.sleep(self.latency)
+        last = messages[-1] if messages else None
+        if last is not None and last.role == MessageRole.USER:
+            roll = self.rng.random()
+            for name, share in self.tool_mix.items():
+                if roll < share:
+                    return TOOL_CALLS[name](self.rng)
+                roll -= share
+            return f"You said: {last.content}"
+        return "Done."
+
+def parse_tool_mix(text: str) -> Dict[str, float]:
+    """Parse ``name=share,...`` into a mapping of tool names to turn shares."""
+    mix: Dict[str, float] = {}
+    for item in filter(None, text.split(",")):
+        name, _, share = item.partition("=")
+        if name not in TOOL_CALLS:
+            raise argparse.ArgumentTypeError(f"Unknown tool: {name}")
+        mix[name] = float(share)
+    if sum(mix.values()) > 1:
+        raise argparse.ArgumentTypeError("Tool shares must add up to at most 1")
+    return mix
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_session(agent: ConversationalAgent, session: int, turns: int, latencies: List[float]) -> None:
+    """Run one session; a turn includes the follow-up that collects tool results."""
+    for turn in range(turns):
+        started = time.perf_counter()
+        await agent.process_message(Message(MessageRole.USER, f"session {session} turn {turn}"))
+        if agent._pending_tool_calls:
+            await agent.process_message(Message(MessageRole.USER, "continue"))
+        latencies.append(time.perf_counter() - started)
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    registry = MetricsRegistry()
+    cache = ToolResultCache() if args.tool_cache else None
+    server = None
+    if args.backend == "http":
+        server = StandInServer(latency=args.latency, tokens_per_second=args.tokens_per_second)
+        await server.start()
+        backend: LLMBackend = HTTPBackend(server.url)
+    else:
+        backend = SimulatedBackend(args.latency, args.tool_mix, args.seed)
+    if args.batch_size > 1:
+        backend = BatchingBackend(backend, max_batch_size=args.batch_size, max_wait=args.batch_wait)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    gc.collect()
+
+    agents = []
+    for i in range(args.sessions):
+        agent = ConversationalAgent(
+            f"bench-{i}", backend=backend, metrics=registry, tool_cache=cache,
+            max_history=args.max_history
+        )
+        agent.add_tool(CalculatorTool())
+        agent.add_tool(WebSearchTool())
+        agents.append(agent)
+
+    latencies: List[float] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(agent, i, args.turns, latencies) for i, agent in enumerate(agents)))
+    elapsed = time.perf_counter() - started
+
+    traced_peak = None
+    if args.trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    await backend.close()
+    if server is not None:
+        await server.close()
+
+    latencies.sort()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "label": args.label,
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "backend": args.backend,
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "tool_mix": args.tool_mix,
+            "tool_cache": args.tool_cache,
+            "batch_size": args.batch_size,
+            "max_history": args.max_history,
+        },
+        "results": {
+            "turns": len(latencies),
+            "elapsed_seconds": elapsed,
+            "turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_traced_bytes": traced_peak,
+            "tool_cache": cache.stats() if cache is not None else None,
+        },
+        "metrics": registry.snapshot(),
+    }
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100, help="Number of concurrent sessions")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per session")
+    parser.add_argument("--backend", choices=["sim", "http"], default="sim",
+                        help="In-process simulated backend, or HTTP to a local stand-in server")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated backend latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0,
+                        help="Token rate of the stand-in server (http backend only)")
+    parser.add_argument("--tool-mix", type=parse_tool_mix, default=parse_tool_mix("calculator=0.2,web_search=0.1"),
+                        help="Share of turns calling each tool, e.g. calculator=0.2,web_search=0.1 (sim backend only)")
+    parser.add_argument("--tool-cache", action="store_true", help="Share a tool result cache between sessions")
+    parser.add_argument("--batch-size", type=int, default=1, help="Micro-batch generation requests up to this size")
+    parser.add_argument("--batch-wait", type=float, default=0.005, help="Longest wait for a batch to fill")
+    parser.add_argument("--max-history", type=int, default=20, help="Messages kept per session")
+    parser.add_argument("--trace-memory", action="store_true", help="Also measure peak Python allocations (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Append the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args))
+    results = report["results"]
+    print(f"{results['turns']} turns in {results['elapsed_seconds']:.2f}s "
+          f"({results['turns_per_second']:.1f} turns/s)")
+    print(f"latency p50={results['latency_p50'] * 1000:.1f}ms p95={results['latency_p95'] * 1000:.1f}ms "
+          f"p99={results['latency_p99'] * 1000:.1f}ms max={results['latency_max'] * 1000:.1f}ms")
+    if results["peak_rss_bytes"] is not None:
+        print(f"peak RSS {results['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    if results["peak_traced_bytes"] is not None:
+        print(f"peak traced allocations {results['peak_traced_bytes'] / 2 ** 20:.1f} MiB")
+
+    if args.output:
+        # Keep a list of runs in the file so results can be compared over time
+        runs: List[Dict[str, Any]] = []
+        if os.path.exists(args.output):
+            with open(args.output) as f:
+                existing = json.load(f)
+            runs = existing if isinstance(existing, list) else [existing]
+        runs.append(report)
+        with open(args.output, "w") as f:
+            json.dump(runs, f, indent=2)
+        print(f"Results appended to {args.output}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Import Time Benchmark
+
+This script measures the cold import cost of the labs packages. Each import
+runs in a fresh interpreter with ``-X importtime``, so every sample starts
+with no labs module loaded, and the cumulative time Python reports for the
+top-level module is recorded. Results can be saved as JSON to compare runs.
+
+Usage:
+    python labs/benchmarks/import_time.py --repeat 20 --output import_times.json
+    python labs/benchmarks/import_time.py ai_agents ai_agents.conversational_agent
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+LABS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bare package imports, plus the modules workers actually use
+DEFAULT_MODULES = [
+    "ai_agents",
+    "data_structures",
+    "test_generator",
+    "ai_agents.conversational_agent",
+    "ai_agents.agent_manager",
+]
+
+# A line of -X importtime output: self time | cumulative time | indented module name
+_IMPORTTIME_LINE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \|(\s*)(\S+)$")
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=LABS_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure_import(module: str) -> Dict[str, Any]:
+    """Import a module in a fresh interpreter.
+
+    Returns:
+        The cumulative import time of the module in seconds, the wall time of
+        the whole interpreter run and the number of modules it imported
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [LABS_DIR, os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    # "import a.b" reports a and a.b as separate top-level entries; startup
+    # modules such as site are top-level too but never match
+    names = {".".join(module.split(".")[:i]) for i in range(1, module.count(".") + 2)}
+    cumulative = 0
+    imported = 0
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        imported += 1
+        if len(match.group(3)) == 1 and match.group(4) in names:
+            cumulative += int(match.group(2))
+    return {
+        "import_seconds": cumulative / 1e6,
+        "wall_seconds": wall,
+        "modules_imported": imported,
+    }
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    imports = [sample["import_seconds"] for sample in samples]
+    walls = [sample["wall_seconds"] for sample in samples]
+    return {
+        "samples": len(samples),
+        "import_median": statistics.median(imports),
+        "import_min": min(imports),
+        "import_max": max(imports),
+        "wall_median": statistics.median(walls),
+        "modules_imported": samples[-1]["modules_imported"],
+    }
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per module")
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Append the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Interpreter startup with no labs imports, to put the numbers in context
+    baseline = summarize([measure_import("sys") for _ in range(args.repeat)])
+    results = {}
+    for module in args.modules:
+        results[module] = summarize([measure_import(module) for _ in range(args.repeat)])
+
+    print(f"interpreter startup {baseline['wall_median'] * 1000:.1f}ms wall")
+    for module, result in results.items():
+        print(f"{module:40} import {result['import_median'] * 1000:7.2f}ms median "
+              f"({result['import_min'] * 1000:.2f}-{result['import_max'] * 1000:.2f}ms), "
+              f"{result['wall_median'] * 1000:.1f}ms wall, {result['modules_imported']} modules")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "label": args.label,
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"repeat": args.repeat, "modules": args.modules},
+        "baseline": baseline,
+        "results": results,
+    }
+    if args.output:
+        # Keep a list of runs in the file so results can be compared over time
+        runs: List[Dict[str, Any]] = []
+        if os.path.exists(args.output):
+            with open(args.output) as f:
+                existing = json.load(f)
+            runs = existing if isinstance(existing, list) else [existing]
+        runs.append(report)
+        with open(args.output, "w") as f:
+            json.dump(runs, f, indent=2)
+        print(f"Results appended to {args.output}")
+    return report
+
+if __name__ == "__main__":
+    main()
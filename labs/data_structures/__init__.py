@@ -2,6 +2,37 @@
 Python Data Structures Lab
 
 This module contains implementations of common data structures in Python.
+
+Submodules and their classes are imported lazily on first access.
 """
+# Kept free of typing and other imports so importing the package stays cheap
+import importlib
+
+_MODULES = ['linked_list', 'stack', 'queue', 'binary_search_tree', 'hash_table', 'graph']
+
+# Public class -> submodule defining it
+_EXPORTS = {
+    'LinkedList': 'linked_list',
+    'Stack': 'stack',
+    'Queue': 'queue',
+    'BinarySearchTree': 'binary_search_tree',
+    'HashTable': 'hash_table',
+    'OpenAddressingHashTable': 'hash_table',
+    'Graph': 'graph',
+}
+
+__all__ = _MODULES + list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _MODULES:
+        # Importing a submodule also binds it as an attribute of the package
+        return importlib.import_module(f".{name}", __name__)
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = ['linked_list', 'stack', 'queue', 'binary_search_tree', 'hash_table', 'graph', 'heap', 'trie']
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
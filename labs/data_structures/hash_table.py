@@ -1,8 +1,10 @@
 """
 Hash Table Implementation
 
-This module provides a basic implementation of a hash table with chaining.
+This module provides a basic implementation of a hash table with chaining,
+and an open-addressing variant that stores entries in parallel arrays.
 """
+from array import array
 
 class HashNode:
     """Node class for hash table chaining."""
@@ -125,6 +127,187 @@ class HashTable:
                 result.append(f"{i}: {' -> '.join(chain)}")
         return "\n".join(result)
 
+# Marks an unused slot in OpenAddressingHashTable
+_EMPTY = object()
+
+# 2**64 / golden ratio, for Fibonacci hashing
+_FIBONACCI = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+class OpenAddressingHashTable:
+    """Hash table using Robin Hood linear probing.
+
+    Keys, values and hashes live in three parallel arrays instead of one node
+    object per entry. A slot's hash is scrambled with Fibonacci hashing and
+    cached as an unsigned 64-bit integer; its top bits select the home slot,
+    so keys are compared only when the cached hashes match, and resizing
+    places entries using the cached hashes without calling ``hash`` again.
+
+    Robin Hood insertion lets an entry take the slot of one that is closer to
+    its home, which keeps probe sequences short and lets lookups for missing
+    keys stop early. Removal shifts the following entries back, so no
+    tombstones are needed.
+    """
+
+    def __init__(self, size=8, load_factor_threshold=0.7):
+        """Initialize the table with room for ``size`` slots (rounded up to a power of two)."""
+        capacity = 8
+        while capacity < size:
+            capacity *= 2
+        self.count = 0
+        self.load_factor_threshold = load_factor_threshold
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Replace the arrays with empty ones of the given capacity."""
+        self.size = capacity
+        self._mask = capacity - 1
+        self._shift = 64 - capacity.bit_length() + 1
+        self._hashes = array('Q', bytes(8 * capacity))
+        self._keys = [_EMPTY] * capacity
+        self._values = [None] * capacity
+
+    @staticmethod
+    def _hash(key):
+        """Scramble the key's hash into 64 bits whose top bits are well mixed."""
+        return (hash(key) * _FIBONACCI) & _MASK64
+
+    def _find(self, key):
+        """Get the slot holding ``key``, or -1."""
+        h = (hash(key) * _FIBONACCI) & _MASK64
+        shift = self._shift
+        index = h >> shift
+        keys = self._keys
+        slot_key = keys[index]
+        if slot_key is _EMPTY:
+            return -1
+        hashes = self._hashes
+        # Most keys sit in their home slot, so check it before setting up the probe loop
+        if hashes[index] == h and (slot_key is key or slot_key == key):
+            return index
+        mask = self._mask
+        distance = 0
+        while True:
+            slot_key = keys[index]
+            if slot_key is _EMPTY:
+                return -1
+            slot_hash = hashes[index]
+            if slot_hash == h and (slot_key is key or slot_key == key):
+                return index
+            # A resident closer to its home than we are to ours means the key is absent
+            if (index - (slot_hash >> shift)) & mask < distance:
+                return -1
+            index = (index + 1) & mask
+            distance += 1
+
+    def _place(self, h, key, value):
+        """Insert an entry known not to be in the table."""
+        shift, mask = self._shift, self._mask
+        hashes, keys, values = self._hashes, self._keys, self._values
+        index = h >> shift
+        distance = 0
+        while True:
+            if keys[index] is _EMPTY:
+                hashes[index] = h
+                keys[index] = key
+                values[index] = value
+                return
+            resident = (index - (hashes[index] >> shift)) & mask
+            if resident < distance:
+                # Take the slot and carry the displaced entry forward
+                h, hashes[index] = hashes[index], h
+                key, keys[index] = keys[index], key
+                value, values[index] = values[index], value
+                distance = resident
+            index = (index + 1) & mask
+            distance += 1
+
+    def _resize(self):
+        """Double the capacity, reusing the cached hashes."""
+        old_hashes, old_keys, old_values = self._hashes, self._keys, self._values
+        self._allocate(self.size * 2)
+        place = self._place
+        for h, key, value in zip(old_hashes, old_keys, old_values):
+            if key is not _EMPTY:
+                place(h, key, value)
+
+    def put(self, key, value):
+        """Insert or update a key-value pair in the hash table."""
+        index = self._find(key)
+        if index >= 0:
+            self._values[index] = value
+            return
+        if (self.count + 1) / self.size > self.load_factor_threshold:
+            self._resize()
+        self._place(self._hash(key), key, value)
+        self.count += 1
+
+    def get(self, key, default=None):
+        """Retrieve the value associated with the given key."""
+        index = self._find(key)
+        return self._values[index] if index >= 0 else default
+
+    def remove(self, key):
+        """Remove the key-value pair from the hash table and return its value."""
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(f"Key not found: {key}")
+        hashes, keys, values = self._hashes, self._keys, self._values
+        shift, mask = self._shift, self._mask
+        value = values[index]
+        # Shift following entries back until one is empty or already at its home slot
+        following = (index + 1) & mask
+        while keys[following] is not _EMPTY and (following - (hashes[following] >> shift)) & mask:
+            hashes[index] = hashes[following]
+            keys[index] = keys[following]
+            values[index] = values[following]
+            index = following
+            following = (following + 1) & mask
+        hashes[index] = 0
+        keys[index] = _EMPTY
+        values[index] = None
+        self.count -= 1
+        return value
+
+    def items(self):
+        """Iterate over the key-value pairs in slot order."""
+        for key, value in zip(self._keys, self._values):
+            if key is not _EMPTY:
+                yield key, value
+
+    def __iter__(self):
+        """Iterate over the keys in slot order."""
+        return (key for key in self._keys if key is not _EMPTY)
+
+    def __len__(self):
+        return self.count
+
+    def __setitem__(self, key, value):
+        """Support for dictionary-style assignment: hash_table[key] = value"""
+        self.put(key, value)
+
+    def __getitem__(self, key):
+        """Support for dictionary-style access: value = hash_table[key]"""
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._values[index]
+
+    def __delitem__(self, key):
+        """Support for deletion: del hash_table[key]"""
+        self.remove(key)
+
+    def __contains__(self, key):
+        """Support for 'in' operator: if key in hash_table"""
+        return self._find(key) >= 0
+
+    def __str__(self):
+        """Return a string representation of the hash table."""
+        return "\n".join(
+            f"{i}: {key}:{value}"
+            for i, (key, value) in enumerate(zip(self._keys, self._values)) if key is not _EMPTY
+        )
+
 # Example usage
 if __name__ == "__main__":
     # Create a hash table
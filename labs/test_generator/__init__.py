@@ -2,12 +2,36 @@
 Test Generator Module
 
 This module provides utilities for generating test cases for data structures and algorithms.
+
+Public names are imported lazily on first access.
 """
+# Kept free of typing and other imports so importing the package stays cheap
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'TestCase': 'base',
+    'TestGenerator': 'base',
+    'DataStructureTestGenerator': 'base',
+    'sorting_test_generator': 'algorithms',
+    'search_test_generator': 'algorithms',
+    'graph_test_generator': 'algorithms',
+    'dynamic_programming_test_generator': 'algorithms',
+    'LinkedListTestGenerator': 'data_structures',
+    'StackTestGenerator': 'data_structures',
+    'QueueTestGenerator': 'data_structures',
+    'BinarySearchTreeTestGenerator': 'data_structures',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = [
-    'TestGenerator',
-    'DataStructureTestGenerator',
-    'sorting_test_generator',
-    'search_test_generator',
-    'graph_test_generator'
-]
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from ai_agents.base_agent import ToolError
+from ai_agents.calculator import evaluate, evaluate_many
+
+
+def test_large_base_with_moderate_exponent_is_rejected():
+    started = time.perf_counter()
+    with pytest.raises(ToolError):
+        evaluate("(10**9000)**9000 % 7")
+    with pytest.raises(ToolError):
+        evaluate_many("(10**9000)**9000 + x", {"x": [1.0]})
+    assert time.perf_counter() - started < 1.0
+
+
+def test_float_base_follows_the_same_limit():
+    with pytest.raises(ToolError):
+        evaluate("2.5**1e9")
+
+
+def test_powers_within_the_limit_still_work():
+    assert evaluate("(2**3000)**30 % 7") == 1.0
+    assert evaluate("2**10") == 1024.0
+
+
+def test_evaluate_many_matches_evaluate_on_negative_exponents():
+    expression = "2**-1 + x**-2"
+    values = [1, 2, 4]
+    expected = [evaluate(expression, {"x": value}) for value in values]
+    assert evaluate_many(expression, {"x": values}) == pytest.approx(expected)
+    assert evaluate_many(expression, [{"x": value} for value in values]) == pytest.approx(expected)
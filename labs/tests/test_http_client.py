@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+import pytest
+
+from ai_agents.backends import HTTPBackend
+from ai_agents.messages import Message, MessageRole
+from ai_agents.standin_server import StandInServer
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    stand_in = StandInServer(latency=0.0)
+    loop.run_until_complete(stand_in.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    asyncio.run_coroutine_threadsafe(stand_in.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_shared_client_works_across_consecutive_event_loops(server):
+    backend = HTTPBackend(server.url)
+
+    async def ask() -> str:
+        return await backend.generate([Message(MessageRole.USER, "hi")])
+
+    assert asyncio.run(ask()) == "You said: hi"
+    assert asyncio.run(ask()) == "You said: hi"
@@ -0,0 +1,44 @@
+import asyncio
+
+from ai_agents.base_agent import Tool, ToolCall
+from ai_agents.conversational_agent import ConversationalAgent
+from ai_agents.metrics import MetricsRegistry
+from ai_agents.single_flight import SingleFlight
+
+
+class SlowSquareTool(Tool):
+    coalesce = True
+    executions = 0
+
+    @property
+    def name(self) -> str:
+        return "slow_square"
+
+    async def execute(self, x: int) -> int:
+        SlowSquareTool.executions += 1
+        await asyncio.sleep(0.05)
+        return x * x
+
+
+def test_identical_calls_from_several_agents_run_once():
+    SlowSquareTool.executions = 0
+    single_flight = SingleFlight()
+    metrics = MetricsRegistry()
+    agents = [
+        ConversationalAgent(f"session-{i}", single_flight=single_flight, metrics=metrics)
+        for i in range(5)
+    ]
+    for agent in agents:
+        agent.add_tool(SlowSquareTool())
+
+    async def ask_all():
+        return await asyncio.gather(*(
+            agent.tool_executor.run_one(agent.tools["slow_square"], ToolCall(f"call-{i}", "slow_square", {"x": 7}))
+            for i, agent in enumerate(agents)
+        ))
+
+    results = asyncio.run(ask_all())
+    assert [result.result for result in results] == [49] * 5
+    assert SlowSquareTool.executions == 1
+    assert single_flight.coalesced["slow_square"] == 4
+    assert metrics.counter_value("tool_coalesced_total", {"tool": "slow_square"}) == 4